@@ -1,27 +1,31 @@
+import time
+import uuid
 import streamlit as st
-import pandas as pd
-import altair as alt
 from datetime import date
-from prophet import Prophet
+from forecasting import forecast_service, forecast_runner, BACKENDS, DEFAULT_BACKEND
 from streamlit_extras.metric_cards import style_metric_cards
-from PIL import Image
-import base64
-import seaborn as sns
-import matplotlib.pyplot as plt
-
-# Loading Image using PIL
-im = Image.open('images/bi_logo.png')
-# Adding Image to web app
-st.set_page_config(page_title="Business Sales Analyzer", page_icon=im)
+from assets import background_css
+from charts import DAY_ORDER, hourly_density, payload_caption
+from table_view import transactions_viewer
+from figures import forecast_png
+from dataset_store import dataset_store
+from shared_frames import shared_frames
+from query_backend import QUERY_BACKENDS, default_backend, make_selection, query_engine
+from profiling import PERF_LOG_ALWAYS, StageTimer, performance_panel, profile_call
+from comparison import COMPARE_DIMENSIONS, COMPARE_MEASURES, file_labels, file_totals, compare_files
+from data_loader import process_upload, process_files, convert_to_parquet, file_format, iter_workbook_chunks, memory_report, UPLOAD_TYPES
+from metrics import MetricsAccumulator, IncrementalAggregator, get_cube, filter_cube_dates
+
+# Adding Image to web app (Streamlit loads the file itself, so PIL is not needed at startup)
+# Altair, matplotlib and Prophet are imported where they are first used, so the
+# splash screen does not pay for them
+st.set_page_config(page_title="Business Sales Analyzer", page_icon="images/bi_logo.png")
 
 # Sidebar logo
 st.sidebar.image("images/bi_logo.png")
 
-# Function to encode the local image to base64
-def get_base64(bin_file):
-    with open(bin_file, 'rb') as f:
-        data = f.read()
-    return base64.b64encode(data).decode()
+# Background images are served from ./static when static serving is enabled (see .streamlit/config.toml)
+STATIC_SERVING = st.get_option("server.enableStaticServing")
 
 # Load CSS Style
 custom_css = """
@@ -53,6 +57,9 @@ div[data-testid="stDataframe"] div[role="button"] p {
 """
 st.markdown(custom_css, unsafe_allow_html=True)
 
+# Lease holder for the parsed frames this session maps from the shared registry
+SESSION_ID = st.session_state.setdefault('session_id', uuid.uuid4().hex)
+
 # Navigation
 page = st.sidebar.selectbox("Choose a page", ["Home", "Analytics"])
 
@@ -60,24 +67,7 @@ page = st.sidebar.selectbox("Choose a page", ["Home", "Analytics"])
 def splash_screen():
     # Image file path
     img_file = 'images/Home (2).png'
-    img_base64 = get_base64(img_file)
-
-    # Custom CSS for full-page background image
-    page_bg_img = f'''
-    <style>
-    body {{
-        background-image: url("data:image/png;base64,{img_base64}");
-        background-size: cover;
-        background-repeat: no-repeat;
-        background-attachment: fixed;
-    }}
-    .stApp {{
-        background: rgba(255, 255, 255, 0.00);  /*optional: to make content more readable */
-        padding: 2rem; /* adjust padding if needed */
-    }}
-    </style>
-    '''
-    st.markdown(page_bg_img, unsafe_allow_html=True)
+    st.markdown(background_css(img_file, static_serving=STATIC_SERVING), unsafe_allow_html=True)
     st.write("")  # Add any additional splash screen content here
 
 # Cover page function
@@ -85,100 +75,195 @@ def cover_page():
     st.title("Welcome to Business Sales Analyzer")
     # Image file path
     img_file = 'images/bg.png'
-    img_base64 = get_base64(img_file)
-
-    # Custom CSS for full-page background image
-    page_bg_img = f'''
-    <style>
-    body {{
-        background-image: url("data:image/png;base64,{img_base64}");
-        background-size: cover;
-        background-repeat: no-repeat;
-        background-attachment: fixed;
-    }}
-    .stApp {{
-        background: rgba(255, 255, 255, 0.00);  /*optional: to make content more readable */
-        padding: 2rem; /* adjust padding if needed */
-    }}
-    </style>
-    '''
-    st.markdown(page_bg_img, unsafe_allow_html=True)
+    st.markdown(background_css(img_file, static_serving=STATIC_SERVING), unsafe_allow_html=True)
     st.write("Analyze your business sales with detailed metrics and visualizations.")
 
-# Process file function
-def process_file(uploaded_file):
-    df = pd.read_excel(uploaded_file, sheet_name="Transactions")
-    df['transaction_date'] = pd.to_datetime(df['transaction_date'])
-    df['hour'] = df['transaction_date'].dt.hour
-    df['day_of_week'] = df['transaction_date'].dt.day_name()
-    return df
-
-# Calculate metrics function
-def calculate_metrics(df):
-    product_sales = df.groupby('product_detail')['transaction_qty'].sum().reset_index()
-    most_sold_product = product_sales.loc[product_sales['transaction_qty'].idxmax()]
-    least_sold_product = product_sales.loc[product_sales['transaction_qty'].idxmin()]
-    type_sales = df.groupby('product_type')['transaction_qty'].sum().reset_index()
-    most_sold_type = type_sales.loc[type_sales['transaction_qty'].idxmax()]
-    category_sales = df.groupby('product_category')['transaction_qty'].sum().reset_index()
-    most_sold_category = category_sales.loc[category_sales['transaction_qty'].idxmax()]
-    hour_sales = df.groupby(df['transaction_date'].dt.hour)['transaction_qty'].sum().reset_index()
-    busiest_hour = hour_sales.loc[hour_sales['transaction_qty'].idxmax()]
-    day_sales = df.groupby('day_of_week')['transaction_qty'].sum().reset_index()
-    busiest_day = day_sales.loc[day_sales['transaction_qty'].idxmax()]
-    most_idle_day = day_sales.loc[day_sales['transaction_qty'].idxmin()]
-    return {
-        'most_sold_product': most_sold_product,
-        'least_sold_product': least_sold_product,
-        'most_sold_type': most_sold_type,
-        'most_sold_category': most_sold_category,
-        'busiest_hour': busiest_hour,
-        'busiest_day': busiest_day,
-        'most_idle_day': most_idle_day
-
-    }
+# Low-memory summary that folds the workbook chunk by chunk instead of loading it whole
+def streaming_summary(uploaded_file):
+    accumulator = MetricsAccumulator()
+    with st.spinner("Reading workbook in chunks..."):
+        for chunk in iter_workbook_chunks(uploaded_file):
+            accumulator.add(chunk)
+
+    if accumulator.count == 0:
+        st.warning("No transactions found in the workbook.")
+        return
+
+    metrics = accumulator.metrics()
+    st.subheader('Key Performance Metrics')
+
+    col1, col2 = st.columns(2)
+    col1.metric(label="Total Items Sold", value=accumulator.count)
+    col2.metric(label="Sum of Product Total Price USD", value=f"{accumulator.price_sum:,.0f}")
+
+    col3, col4 = st.columns(2)
+    col3.metric(label="Maximum Price PHP", value=f"{accumulator.price_max:,.0f}")
+    col4.metric(label="Minimum Price PHP", value=f"{accumulator.price_min:,.0f}")
+
+    style_metric_cards(background_color="#00588E", border_left_color="#FF4B44", border_color="#1f66bd", box_shadow="#F71938")
+
+    col5, col6 = st.columns(2)
+    col5.metric(label="Most Sold Product", value=metrics['most_sold_product']['product_detail'], delta=int(metrics['most_sold_product']['transaction_qty']))
+    col6.metric(label="Least Sold Product", value=metrics['least_sold_product']['product_detail'], delta=int(metrics['least_sold_product']['transaction_qty']))
+
+    col7, col8 = st.columns(2)
+    col7.metric(label="Most Sold Product Type", value=metrics['most_sold_type']['product_type'], delta=int(metrics['most_sold_type']['transaction_qty']))
+    col8.metric(label="Most Sold Product Category", value=metrics['most_sold_category']['product_category'], delta=int(metrics['most_sold_category']['transaction_qty']))
+
+    col9, col10 = st.columns(2)
+    col9.metric(label="Most Idle Day", value=metrics['most_idle_day']['day_of_week'], delta=int(metrics['most_idle_day']['transaction_qty']))
+    col10.metric(label="Busiest Day", value=metrics['busiest_day']['day_of_week'], delta=int(metrics['busiest_day']['transaction_qty']))
+
+    # Daily revenue from the folded per-day totals
+    st.subheader("Daily Revenue")
+    revenue_df, _ = accumulator.daily_series()
+    st.line_chart(revenue_df.set_index('ds')['y'])
+
+# Timing readout shown under each forecast
+def fit_time_caption(backend, seconds):
+    if seconds is None:
+        return f"{BACKENDS[backend]}: served from cache"
+    return f"{BACKENDS[backend]}: fitted in {seconds * 1000:,.0f} ms"
+
+# Wait for a background forecast job and draw its plots into the placeholders. Updating the
+# placeholders while waiting lets Streamlit stop this run as soon as a widget changes; the
+# job keeps running, and the next run either picks it up or cancels it if the inputs changed.
+def show_forecasts(job, slots, backend):
+    while not job.done():
+        for image_slot, _, _ in slots.values():
+            image_slot.info(f"Fitting forecast... {job.elapsed():.0f} s")
+        time.sleep(0.5)
+    results = job.result()
+    for name, (image_slot, caption_slot, labels) in slots.items():
+        model, forecast = results[name]
+        image_slot.image(forecast_png(model, forecast, **labels))
+        caption_slot.caption(fit_time_caption(backend, job.timings[name]))
+
+# Data from a single upload, as (frame, content key), or None when there is nothing to chart
+def upload_source():
+    uploaded_file = st.sidebar.file_uploader("Upload your Excel, Parquet or CSV file", type=UPLOAD_TYPES)
+    if not uploaded_file:
+        splash_screen()
+        return None
+
+    # Large workbooks can be summarised without loading the whole sheet
+    if file_format(uploaded_file) == 'xlsx' and st.sidebar.checkbox("Low-memory mode (stream the workbook)"):
+        cover_page()
+        streaming_summary(uploaded_file)
+        return None
+
+    # One-time conversion so repeat analyses can skip the slow Excel parse
+    if file_format(uploaded_file) == 'xlsx' and st.sidebar.button("Convert workbook to Parquet"):
+        st.sidebar.download_button("Download Parquet file", data=convert_to_parquet(uploaded_file),
+                                   file_name=uploaded_file.name.rsplit('.', 1)[0] + '.parquet')
+
+    key, df = process_upload(uploaded_file, holder=SESSION_ID)
+    return df, key
+
+# Data from the persistent dataset store, which monthly workbooks are appended to once
+# and which then opens from Parquet without re-reading any Excel file
+def store_source():
+    names = dataset_store.datasets()
+    with st.sidebar.expander("Add workbooks to a dataset"):
+        dataset = st.text_input("Dataset name", value=names[0] if names else "transactions")
+        new_files = st.file_uploader("Workbooks", type=UPLOAD_TYPES, accept_multiple_files=True, key="store_uploader")
+        if new_files and st.button("Append to dataset"):
+            try:
+                with st.spinner("Appending..."):
+                    added = dataset_store.append_files(dataset, new_files)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.success(f"Added {added:,} new transactions to {dataset}")
+                names = dataset_store.datasets()
+
+    if not names:
+        st.sidebar.warning("The dataset store is empty. Add workbooks to proceed.")
+        splash_screen()
+        return None
+    dataset = st.sidebar.selectbox("Dataset", names)
+    with st.sidebar.expander("Ingested files"):
+        st.dataframe(dataset_store.history(dataset))
+    try:
+        return dataset_store.load(dataset, holder=SESSION_ID), dataset_store.dataset_key(dataset)
+    except ValueError as e:
+        st.sidebar.warning(str(e))
+        splash_screen()
+        return None
 
 # Home page
 def home_page():
-    uploaded_file = st.sidebar.file_uploader("Upload your Excel file", type=["xlsx"])
-    if uploaded_file:
+    timer.checkpoint('load')
+    source = st.sidebar.radio("Data source", ["Upload a file", "Dataset store"])
+    loaded = store_source() if source == "Dataset store" else upload_source()
+    if loaded:
+        df, key = loaded
         cover_page()
-        df = process_file(uploaded_file)
 
-        # Convert the time strings to datetime.time objects
-        df['transaction_time'] = pd.to_datetime(df['transaction_time'], format='%H:%M:%S').dt.time
-        # Add 'hour' column
-        df['hour'] = pd.to_datetime(df['transaction_time'], format='%H:%M:%S').dt.hour
+        # Memory used by the parsed frame, before and after the compact schema
+        with st.sidebar.expander("Memory usage"):
+            report = memory_report(df)
+            st.dataframe(report)
+            st.caption(f"{report['before'].sum() / 1e6:,.1f} MB in pandas' default types, {report['after'].sum() / 1e6:,.1f} MB compacted")
+            shared = shared_frames.stats()
+            st.caption(f"Memory-mapped and shared with other sessions: {shared['mapped']} datasets, {shared['leases']} leases")
+
+        # Pre-aggregated cube (day x hour x store x category x type x product), built once per dataset;
+        # the filters and KPIs below are answered from it instead of the transaction rows
+        timer.checkpoint('cube')
+        cube = get_cube(key, df)
 
         # Date filter
-        start_date = st.sidebar.date_input("Start Date", min(df['transaction_date']).date())
-        end_date = st.sidebar.date_input("End Date", max(df['transaction_date']).date())
+        start_date = st.sidebar.date_input("Start Date", min(cube['day']).date())
+        end_date = st.sidebar.date_input("End Date", max(cube['day']).date())
 
         # Filter data by date
-        df_filtered = df[(df['transaction_date'] >= pd.Timestamp(start_date)) & (df['transaction_date'] <= pd.Timestamp(end_date))]
+        cube_filtered = filter_cube_dates(cube, start_date, end_date)
 
         # Sidebar filters
         st.sidebar.header("Please filter the data")
-        city = st.sidebar.multiselect("Select Store Location", options=df_filtered["store_location"].unique(), default=df_filtered["store_location"].unique())
-        category = st.sidebar.multiselect("Select Category", options=df_filtered["product_category"].unique(), default=df_filtered["product_category"].unique())
-        product_type = st.sidebar.multiselect("Select Type", options=df_filtered["product_type"].unique(), default=df_filtered["product_type"].unique())
-
-        df_selection = df_filtered.query("store_location == @city & product_category == @category & product_type == @product_type")
-
-        if df_selection.empty:
+        city = st.sidebar.multiselect("Select Store Location", options=cube_filtered["store_location"].unique().tolist(), default=cube_filtered["store_location"].unique().tolist())
+        category = st.sidebar.multiselect("Select Category", options=cube_filtered["product_category"].unique().tolist(), default=cube_filtered["product_category"].unique().tolist())
+        product_type = st.sidebar.multiselect("Select Type", options=cube_filtered["product_type"].unique().tolist(), default=cube_filtered["product_type"].unique().tolist())
+
+        timer.checkpoint('aggregate')
+        # Running totals for this session; a filter or date change only adds or subtracts
+        # the cube cells of the days and groups that were switched on or off
+        if st.session_state.get('aggregator_key') != key:
+            # The previous dataset's frame can be unmapped once no other session uses it
+            if st.session_state.get('aggregator_key'):
+                shared_frames.release(SESSION_ID, st.session_state['aggregator_key'])
+            st.session_state['aggregator'] = IncrementalAggregator(cube)
+            st.session_state['aggregator_key'] = key
+        aggregator = st.session_state['aggregator'].update(start_date, end_date, city, category, product_type)
+
+        timer.checkpoint('query')
+        # Query engine the table pages and the batch forecast read their rows from, on demand
+        query_backend = st.sidebar.selectbox("Query engine", list(QUERY_BACKENDS), index=list(QUERY_BACKENDS).index(default_backend()),
+                                             format_func=QUERY_BACKENDS.get)
+        engine = query_engine(key, df, query_backend)
+        selection = make_selection(start_date, end_date, city, category, product_type)
+
+        # Forecast model; Prophet is more accurate but takes seconds per fit
+        backend = st.sidebar.selectbox("Forecast model", list(BACKENDS), index=list(BACKENDS).index(DEFAULT_BACKEND),
+                                       format_func=BACKENDS.get)
+
+        if aggregator.empty:
             st.warning("No data available provided from the selection. Please select accordingly.")
         else:
-            metrics = calculate_metrics(df_selection)
+            timer.checkpoint('kpis')
+            metrics = aggregator.metrics()
+            kpis = aggregator.kpis()
             # Metrics display
             st.subheader('Key Performance Metrics')
 
             col1, col2 = st.columns(2)
-            col1.metric(label="Total Items Sold", value=df_selection.product_detail.count())
-            col2.metric(label="Sum of Product Total Price USD", value=f"{df_selection.unit_price.sum():,.0f}")
+            col1.metric(label="Total Items Sold", value=kpis['count'])
+            col2.metric(label="Sum of Product Total Price USD", value=f"{kpis['price_sum']:,.0f}")
 
             col3, col4 = st.columns(2)
-            col3.metric(label="Maximum Price PHP", value=f"{df_selection.unit_price.max():,.0f}")
-            col4.metric(label="Minimum Price PHP", value=f"{df_selection.unit_price.min():,.0f}")
+            col3.metric(label="Maximum Price PHP", value=f"{kpis['price_max']:,.0f}")
+            col4.metric(label="Minimum Price PHP", value=f"{kpis['price_min']:,.0f}")
 
             style_metric_cards(background_color="#00588E", border_left_color="#FF4B44", border_color="#1f66bd", box_shadow="#F71938")
 
@@ -196,26 +281,31 @@ def home_page():
             col10.metric(label="Busiest Day", value=metrics['busiest_day']['day_of_week'], delta=int(metrics['busiest_day']['transaction_qty']))
 
             # Show a table of the transactions
+            timer.checkpoint('table')
             st.subheader("Transactions Table")
-            st.write(df_selection)
+            transactions_viewer(engine, selection)
 
             # Plot transaction times by hour
+            timer.checkpoint('hourly_density')
             st.subheader('Transaction Times by Hour')
-            plt.figure(figsize=(10, 6))
-            sns.kdeplot(df_selection["hour"], bw_adjust=0.5)
-            plt.xlabel('Hour of the Day')
-            plt.ylabel('Density')
-            plt.title('Density Plot of Transactions by Hour')
+            import altair as alt
+            hour_counts = aggregator.distribution('hour', 'count').set_index('hour')['count']
+            density_chart = alt.Chart(hourly_density(hour_counts)).mark_area(opacity=0.5, line=True).encode(
+                x=alt.X('hour:Q', title='Hour of the Day'),
+                y=alt.Y('density:Q', title='Density')
+            ).properties(title='Density Plot of Transactions by Hour', width=700, height=400)
 
-            # Calculate the busiest hours
-            busiest_hours = df['hour'].value_counts().nlargest(3).index.tolist()  # Top 3 busiest hours
+            # Calculate the busiest hours of the current selection
+            busiest_hours = hour_counts.nlargest(3).index.tolist()  # Top 3 busiest hours
 
             description = f"The most busiest hours are: {', '.join(map(str, busiest_hours))}h"
-            st.write(0.5, 0.01, description, wrap=True, horizontalalignment='center', fontsize=12)
+            st.write(description)
 
-            st.pyplot(plt.gcf())
+            st.altair_chart(density_chart)
+            st.caption(payload_caption(density_chart))
 
             # Progress Bar
+            timer.checkpoint('charts')
             def Progressbar(current, target, label):
                 st.markdown("""<style>.stProgress > div > div > div > div { background-image: linear-gradient(to right, #99ff99 , #FFFF00)}</style>""", unsafe_allow_html=True)
                 percent = round((current / target) * 100)
@@ -229,50 +319,52 @@ def home_page():
             col11, col12 = st.columns(2)
             with col11:
                 st.subheader("Target Percentage")
-                Progressbar(df_selection["unit_price"].sum(), 30000000, "Revenue")
+                Progressbar(kpis['price_sum'], 30000000, "Revenue")
             
             # Bar chart for sales by day of the week
             st.subheader("Sales by Day of the Week")
-            bar_chart = alt.Chart(df_selection).mark_bar().encode(
-                x=alt.X('day_of_week', sort=['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']),
+            weekday_sales = aggregator.distribution('day_of_week', 'qty', name='transaction_qty')
+            bar_chart = alt.Chart(weekday_sales).mark_bar().encode(
+                x=alt.X('day_of_week', sort=DAY_ORDER),
                 y='transaction_qty'
             ).properties(width=700, height=400)
             st.altair_chart(bar_chart)
+            st.caption(payload_caption(bar_chart))
 
             # Pie chart for product category distribution
             st.subheader("Product Category Distribution")
-            category_distribution = df_selection['product_category'].value_counts().reset_index()
-            category_distribution.columns = ['product_category', 'count']
+            category_distribution = aggregator.distribution('product_category', 'count').sort_values('count', ascending=False)
             pie_chart = alt.Chart(category_distribution).mark_arc().encode(
                 theta=alt.Theta(field="count", type="quantitative"),
                 color=alt.Color(field="product_category", type="nominal"),
                 tooltip=['product_category', 'count']
             ).properties(width=700, height=400)
             st.altair_chart(pie_chart)
+            st.caption(payload_caption(pie_chart))
 
             # Pie chart for store revenue distribution
             st.subheader("Store Revenue Distribution")
-            store_revenue_distribution = df_selection.groupby('store_location')['unit_price'].sum().reset_index()
-            store_revenue_distribution.columns = ['store_location', 'revenue']
+            store_revenue_distribution = aggregator.distribution('store_location', 'price', name='revenue')
             pie_chart_store = alt.Chart(store_revenue_distribution).mark_arc().encode(
                 theta=alt.Theta(field="revenue", type="quantitative"),
                 color=alt.Color(field="store_location", type="nominal"),
                 tooltip=['store_location', 'revenue']
             ).properties(width=700, height=400)
             st.altair_chart(pie_chart_store)
+            st.caption(payload_caption(pie_chart_store))
             # Revenue forecast plot
+            timer.checkpoint('forecasts')
             st.subheader("Revenue Forecast")
-            revenue_df = df_selection.groupby(pd.Grouper(key='transaction_date', freq='D')).agg({'unit_price': 'sum'}).reset_index()
-            revenue_df.columns = ['ds', 'y']
-
-            m = Prophet(yearly_seasonality=True, daily_seasonality=True)
-            m.fit(revenue_df)
-
-            future = m.make_future_dataframe(periods=30)
-            forecast = m.predict(future)
-
-            fig = m.plot(forecast, xlabel='Date', ylabel='Revenue')
-            st.pyplot(fig)
+            # Daily revenue (unit price sum) and average unit price, already in Prophet's ds/y layout
+            revenue_df, price_df = aggregator.daily_series()
+
+            # Fit the revenue and unit price models in the background and predict the next 30 days.
+            # The plots are placeholders until the fits finish; the rest of the page renders meanwhile.
+            forecast_job = forecast_runner.submit(SESSION_ID, {
+                'revenue': (revenue_df, {'yearly_seasonality': True, 'daily_seasonality': True}),
+                'price': (price_df, {}),
+            }, periods=30, backend=backend)
+            forecast_slots = {'revenue': (st.empty(), st.empty(), {'xlabel': 'Date', 'ylabel': 'Revenue'})}
             st.write("""
             The graph above displays the forecasted revenue for the next 30 days. 
 
@@ -291,23 +383,9 @@ def home_page():
             """)    
         
 
-            # Aggregate unit price by date
+            # Unit price forecast plot
             st.subheader("Unit Price Forecast")
-            price_df = df_selection.groupby(pd.Grouper(key='transaction_date', freq='D')).agg({'unit_price': 'mean'}).reset_index()
-
-            # Rename columns as Prophet expects 'ds' and 'y' column names
-            price_df = price_df.rename(columns={'transaction_date': 'ds', 'unit_price': 'y'})
-
-            # Train Prophet model for unit price
-            price_model = Prophet()
-            price_model.fit(price_df)
-
-            # Make future predictions for unit price
-            price_future = price_model.make_future_dataframe(periods=30)  # Predict unit price for the next 30 days
-            price_forecast = price_model.predict(price_future)
-
-            fig_price = price_model.plot(price_forecast)
-            st.write(fig_price)
+            forecast_slots['price'] = (st.empty(), st.empty(), {})
             st.write("""
             The graph above shows the forecasted average unit price for the next 30 days. 
 
@@ -325,29 +403,69 @@ def home_page():
             4. **Cost Management**: Monitor and manage costs effectively if the forecast predicts a decline in unit prices to maintain margins.
             5. **Inventory Decisions**: Align your inventory purchasing decisions with the forecasted price trends to avoid overstocking or stockouts.
             """)
-            
-    else :
-        splash_screen()
-
-# Function to process and analyze files for the analytics page
-def process_and_analyze_file(uploaded_file1, uploaded_file2):
-    df1 = process_file(uploaded_file1)
-    df2 = process_file(uploaded_file(uploaded_file2))
-    
-    if df1 is not None and df2 is not None:
-        st.subheader('Key Performance Metrics for First File')
-        metrics1 = calculate_metrics(df1)
 
+            # Batch forecast: one revenue model per store or category, fitted in parallel
+            timer.checkpoint('batch_forecast')
+            st.subheader("Revenue Forecast by Group")
+            dimension = st.selectbox("Forecast each", ["store_location", "product_category"],
+                                     format_func=lambda c: c.replace('_', ' ').title())
+            if st.button("Run batch forecast"):
+                # Rows are only read from the engine when a batch forecast is asked for
+                rows = engine.select(selection, ['transaction_date', dimension, 'unit_price'])
+                batch = forecast_service.batch_forecast(rows, dimension, periods=30, backend=backend, yearly_seasonality=True, daily_seasonality=True)
+                batch_chart = alt.Chart(batch).mark_line().encode(
+                    x=alt.X('ds:T', title='Date'),
+                    y=alt.Y('yhat:Q', title='Revenue'),
+                    color=alt.Color('group:N', title=dimension.replace('_', ' ').title()),
+                    tooltip=['group', 'ds:T', 'yhat', 'yhat_lower', 'yhat_upper']
+                ).properties(width=700, height=400)
+                st.altair_chart(batch_chart)
+                st.caption(payload_caption(batch_chart))
+                st.download_button("Download forecasts (CSV)", data=batch.to_csv(index=False),
+                                   file_name=f"revenue_forecast_by_{dimension}.csv", mime="text/csv")
+
+            # Everything else is on screen; fill in the forecasts as the background job finishes
+            timer.checkpoint('forecast_wait')
+            show_forecasts(forecast_job, forecast_slots, backend)
+
+# Function to process and analyze files for the analytics page. The uploads are parsed
+# concurrently and compared through their cubes, so adding files adds little to a rerun.
+def process_and_analyze_files(uploaded_files):
+    timer.checkpoint('parse')
+    labels = file_labels(uploaded_files)
+    cubes = [get_cube(key, df) for key, df in process_files(uploaded_files, holder=SESSION_ID)]
+
+    st.subheader('Key Performance Metrics per File')
+    totals = file_totals(cubes, labels)
+    for i, (label, row) in enumerate(totals.iterrows()):
+        st.markdown(f"**{label}**")
         col1, col2 = st.columns(2)
-        col1.metric(label="Total Items Sold", value=df1.product_detail.count(), delta="Number of Items Sold")
-        col2.metric(label="Sum of Product Total Price PHP", value=f"{df1.unit_price.sum():,.0f}", delta="Total Price")
-
-        st.subheader('Key Performance Metrics for Second File')
-        metrics2 = calculate_metrics(df2)
-
-        col3, col4 = st.columns(2)
-        col3.metric(label="Total Items Sold", value=df2.product_detail.count(), delta="Number of Items Sold")
-        col4.metric(label="Sum of Product Total Price PHP", value=f"{df2.unit_price.sum():,.0f}", delta="Total Price")
+        if i == 0:
+            col1.metric(label="Total Items Sold", value=int(row['count']), delta="Number of Items Sold")
+            col2.metric(label="Sum of Product Total Price PHP", value=f"{row['price_sum']:,.0f}", delta="Total Price")
+        else:
+            # Changes against the first file
+            col1.metric(label="Total Items Sold", value=int(row['count']), delta=int(row['count_delta']))
+            col2.metric(label="Sum of Product Total Price PHP", value=f"{row['price_sum']:,.0f}", delta=f"{row['price_sum_delta']:,.0f}")
+
+    timer.checkpoint('compare')
+    st.subheader(f"Changes against {labels[0]}")
+    col1, col2 = st.columns(2)
+    dimension = col1.selectbox("Compare by", options=list(COMPARE_DIMENSIONS), format_func=COMPARE_DIMENSIONS.get)
+    measure = col2.selectbox("Measure", options=list(COMPARE_MEASURES), format_func=COMPARE_MEASURES.get)
+    comparison = compare_files(cubes, labels, dimension, measure)
+
+    import altair as alt
+    per_file = comparison[labels].reset_index().melt(id_vars=dimension, var_name='file', value_name=measure)
+    x = alt.X(f'{dimension}:T' if dimension == 'day' else f'{dimension}:N', title=COMPARE_DIMENSIONS[dimension])
+    comparison_chart = alt.Chart(per_file).mark_line(point=True).encode(
+        x=x,
+        y=alt.Y(f'{measure}:Q', title=COMPARE_MEASURES[measure]),
+        color=alt.Color('file:N', title='File')
+    ).properties(width=700, height=400)
+    st.altair_chart(comparison_chart)
+    st.caption(payload_caption(comparison_chart))
+    st.dataframe(comparison, use_container_width=True)
 
 # Print button function
 def print_button():
@@ -372,20 +490,41 @@ def print_button():
 
 # Analytics page
 def analytics_page():
+    # Home page forecasts still running for this session are no longer wanted
+    forecast_runner.cancel(SESSION_ID)
     cover_page()
     st.title("Analytics Page")
     st.sidebar.subheader("Upload your Excel files")
     
-    uploaded_file1 = st.sidebar.file_uploader("Choose the first file", type=["xlsx"], key="file_uploader_analytics_1")
-    uploaded_file2 = st.sidebar.file_uploader("Choose the second file", type=["xlsx"], key="file_uploader_analytics_2")
+    # The first file is the baseline the others are compared against
+    uploaded_files = st.sidebar.file_uploader("Choose two or more files", type=UPLOAD_TYPES, accept_multiple_files=True, key="file_uploader_analytics")
     
-    if uploaded_file1 and uploaded_file2:
-        process_and_analyze_file(uploaded_file1, uploaded_file2)
+    if uploaded_files and len(uploaded_files) >= 2:
+        process_and_analyze_files(uploaded_files)
     else:
-        st.sidebar.warning("Please upload both Excel files to proceed.")
+        st.sidebar.warning("Please upload at least two Excel files to proceed.")
 
 # Main logic for page selection
-if page == "Home":
-    home_page()
-elif page == "Analytics":
-    analytics_page()
+def run_page():
+    if page == "Home":
+        home_page()
+    elif page == "Analytics":
+        analytics_page()
+
+# Per-stage wall time, CPU time and (with the panel open) peak allocations of this rerun
+show_performance = st.sidebar.checkbox("Performance panel")
+timer = StageTimer(trace_memory=show_performance)
+profile = None
+try:
+    if st.session_state.pop('profile_next_rerun', False):
+        _, profile_path, profile_summary = profile_call(run_page)
+        profile = (profile_path, profile_summary)
+    else:
+        run_page()
+finally:
+    # Streamlit stops a rerun by raising inside it; the tracer must still be released
+    timer.finish()
+if show_performance or PERF_LOG_ALWAYS:
+    timer.log(page=page)
+if show_performance:
+    performance_panel(timer, profile)
@@ -0,0 +1,57 @@
+import base64
+import functools
+import os
+import re
+
+# Streamlit serves files in this folder at app/static/ when server.enableStaticServing is on
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Function to encode the local image to base64, once per process
+@functools.lru_cache(maxsize=None)
+def get_base64(bin_file):
+    with open(bin_file, 'rb') as f:
+        data = f.read()
+    return base64.b64encode(data).decode()
+
+# Downsize and recompress an image to WebP in the static folder, once per process.
+# Returns the URL the browser fetches (and caches) it from.
+@functools.lru_cache(maxsize=None)
+def static_webp(img_file, max_width=1920, quality=80):
+    name = re.sub(r'[^A-Za-z0-9_-]+', '_', os.path.splitext(os.path.basename(img_file))[0]).strip('_') + '.webp'
+    target = os.path.join(STATIC_DIR, name)
+    if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(img_file):
+        from PIL import Image
+
+        with Image.open(img_file) as im:
+            image = im.copy()
+        if image.width > max_width:
+            image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+        os.makedirs(STATIC_DIR, exist_ok=True)
+        # Write to a temporary file first so concurrent sessions never serve a partial image
+        tmp = f"{target}.{os.getpid()}.tmp"
+        image.save(tmp, 'WEBP', quality=quality)
+        os.replace(tmp, target)
+    return f"app/static/{name}"
+
+# Custom CSS for full-page background image. With static serving the CSS only carries
+# a URL; otherwise it falls back to an inline data URI that is encoded once per process.
+@functools.lru_cache(maxsize=None)
+def background_css(img_file, static_serving=True):
+    if static_serving:
+        url = static_webp(img_file)
+    else:
+        url = f"data:image/png;base64,{get_base64(img_file)}"
+    return f'''
+    <style>
+    body {{
+        background-image: url("{url}");
+        background-size: cover;
+        background-repeat: no-repeat;
+        background-attachment: fixed;
+    }}
+    .stApp {{
+        background: rgba(255, 255, 255, 0.00);  /*optional: to make content more readable */
+        padding: 2rem; /* adjust padding if needed */
+    }}
+    </style>
+    '''
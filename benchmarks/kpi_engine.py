@@ -0,0 +1,97 @@
+"""Per-rerun KPI latency: seven groupbys versus the single-pass bincount engine.
+
+    python benchmarks/kpi_engine.py [--sizes 100000,1000000,10000000] [--repeat 3] [--json kpis.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import calculate_kpis  # noqa: E402
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+# Transactions with the dashboard's columns and object-dtype strings, as read from Excel
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    products = np.array([f"Product {i}" for i in range(80)], dtype=object)
+    product = rng.integers(0, len(products), rows)
+    dates = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 181, rows), unit='D')
+    return pd.DataFrame({
+        'transaction_date': dates,
+        'transaction_qty': rng.integers(1, 4, rows),
+        'unit_price': rng.choice([2.5, 3.0, 3.75, 4.25, 8.0], rows),
+        'product_detail': products[product],
+        'product_type': np.array([f"Type {i}" for i in range(29)], dtype=object)[product % 29],
+        'product_category': np.array([f"Category {i}" for i in range(9)], dtype=object)[product % 9],
+        'day_of_week': dates.day_name().to_numpy(dtype=object),
+    })
+
+
+# The original calculate_metrics plus the separate count/sum/max/min scans from Main.py
+def groupby_kpis(df):
+    product_sales = df.groupby('product_detail')['transaction_qty'].sum().reset_index()
+    type_sales = df.groupby('product_type')['transaction_qty'].sum().reset_index()
+    category_sales = df.groupby('product_category')['transaction_qty'].sum().reset_index()
+    hour_sales = df.groupby(df['transaction_date'].dt.hour)['transaction_qty'].sum().reset_index()
+    day_sales = df.groupby('day_of_week')['transaction_qty'].sum().reset_index()
+    return {
+        'most_sold_product': product_sales.loc[product_sales['transaction_qty'].idxmax()],
+        'least_sold_product': product_sales.loc[product_sales['transaction_qty'].idxmin()],
+        'most_sold_type': type_sales.loc[type_sales['transaction_qty'].idxmax()],
+        'most_sold_category': category_sales.loc[category_sales['transaction_qty'].idxmax()],
+        'busiest_hour': hour_sales.loc[hour_sales['transaction_qty'].idxmax()],
+        'busiest_day': day_sales.loc[day_sales['transaction_qty'].idxmax()],
+        'most_idle_day': day_sales.loc[day_sales['transaction_qty'].idxmin()],
+        'count': df.product_detail.count(),
+        'price_sum': df.unit_price.sum(),
+        'price_max': df.unit_price.max(),
+        'price_min': df.unit_price.min(),
+    }
+
+
+def best_of(func, df, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100000,1000000,10000000', help="comma-separated row counts")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per measurement (median is reported)")
+    parser.add_argument('--json', help="write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'rows':>12} {'groupby':>12} {'engine':>12} {'speedup':>8}")
+    for rows in (int(size) for size in args.sizes.split(',')):
+        df = make_frame(rows)
+        # Both implementations must agree before their timings mean anything
+        expected, actual = groupby_kpis(df), calculate_kpis(df)
+        for key in expected:
+            assert np.all(np.asarray(expected[key]) == np.asarray(actual[key])), key
+        baseline = best_of(groupby_kpis, df, args.repeat)
+        engine = best_of(calculate_kpis, df, args.repeat)
+        results.append({'rows': rows, 'groupby_seconds': baseline, 'engine_seconds': engine})
+        print(f"{rows:>12,} {baseline * 1000:>10.1f}ms {engine * 1000:>10.1f}ms {baseline / engine:>7.1f}x")
+        del df
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
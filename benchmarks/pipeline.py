@@ -0,0 +1,208 @@
+"""End-to-end pipeline benchmark on synthetic transactions.
+
+Times each stage the Home page runs on a rerun: parsing the upload, the KPI engine,
+the filter step, chart data preparation and the revenue and price forecasts.
+Results go to JSON so runs of different versions can be compared.
+
+    python benchmarks/pipeline.py [--sizes 10000,100000,1000000,10000000] [--format parquet]
+                                  [--forecast-backend holt_winters] [--repeat 3]
+                                  [--json pipeline.json] [--baseline previous.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import EXCEL_MAX_ROWS, generate_transactions, write_transactions  # noqa: E402
+from data_loader import file_fingerprint, process_file, read_bytes  # noqa: E402
+from shared_frames import SharedFrameRegistry, shared_frames  # noqa: E402
+from metrics import IncrementalAggregator, build_cube, calculate_metrics  # noqa: E402
+from charts import hourly_density  # noqa: E402
+from forecasting import forecast_service  # noqa: E402
+from query_backend import ENGINES, make_selection  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def median_time(func, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+# A realistic sidebar change: one store off and the last week cut from the range
+def sample_selection(df):
+    stores = sorted(df['store_location'].unique())
+    start, end = df['transaction_date'].min(), df['transaction_date'].max() - pd.Timedelta(days=7)
+    return (start, end, stores[1:], list(df['product_category'].unique()), list(df['product_type'].unique()))
+
+
+# KPIs of a selection recomputed from scratch over the cube, the reference the
+# incremental add/subtract updates are checked against
+def cube_recompute(cube, start_date, end_date, stores, categories, types):
+    cells = cube[(cube['day'] >= pd.Timestamp(start_date).normalize()) & (cube['day'] <= pd.Timestamp(end_date).normalize())
+                 & cube['store_location'].isin(stores) & cube['product_category'].isin(categories)
+                 & cube['product_type'].isin(types)]
+
+    def pick(column, which):
+        totals = cells.groupby(column, observed=True)['transaction_qty'].sum().reset_index()
+        row = totals.loc[getattr(totals['transaction_qty'], which)()]
+        return [row[column], row['transaction_qty']]
+
+    return {
+        'most_sold_product': pick('product_detail', 'idxmax'),
+        'least_sold_product': pick('product_detail', 'idxmin'),
+        'most_sold_type': pick('product_type', 'idxmax'),
+        'most_sold_category': pick('product_category', 'idxmax'),
+        'busiest_hour': pick('hour', 'idxmax'),
+        'busiest_day': pick('day_of_week', 'idxmax'),
+        'most_idle_day': pick('day_of_week', 'idxmin'),
+        'count': int(cells['count'].sum()),
+        'price_sum': float(cells['unit_price'].sum()),
+        'price_max': float(cells['price_max'].max()),
+        'price_min': float(cells['price_min'].min()),
+    }
+
+
+# The running totals must match a full recompute before their timings mean anything
+def check_incremental(aggregator, cube, selection):
+    expected = cube_recompute(cube, *selection)
+    actual = {**aggregator.metrics(), **aggregator.kpis()}
+    for key in expected:
+        if key.startswith('price'):
+            assert np.isclose(expected[key], actual[key]), key
+        else:
+            assert np.all(np.asarray(expected[key], dtype=object) == np.asarray(actual[key], dtype=object)), key
+
+
+def run_size(rows, file_format, forecast_backend, repeat, workdir):
+    timings = {}
+    df = generate_transactions(rows)
+    # Excel cannot hold more than about a million rows; larger sizes are read from Parquet
+    if file_format == 'xlsx' and rows > EXCEL_MAX_ROWS:
+        file_format = 'parquet'
+    path = os.path.join(workdir, f"transactions_{rows}.{file_format}")
+    write_transactions(df, path)
+    del df
+
+    # Cold parse: the shared frame files are removed before every run
+    timings['process_file'] = median_time(lambda: process_file(path), repeat, setup=lambda: shared_frames.clear(files=True))
+    df = process_file(path)
+    # What another session or process pays for an upload that is already published
+    key = file_fingerprint(read_bytes(path))
+    timings['open_shared'] = median_time(lambda: SharedFrameRegistry(shared_frames.root).open(key), repeat)
+    timings['calculate_metrics'] = median_time(lambda: calculate_metrics(df), repeat)
+
+    start_date, end_date, stores, categories, types = sample_selection(df)
+    selection = make_selection(start_date, end_date, stores, categories, types)
+    for name, engine_class in ENGINES.items():
+        try:
+            engine = engine_class(df)
+        except ImportError:
+            continue
+        timings[f'filter_{name}'] = median_time(lambda: engine.select(selection), repeat)
+
+    cube = build_cube(df)
+    timings['build_cube'] = median_time(lambda: build_cube(df), repeat)
+    full_selection = (df['transaction_date'].min(), df['transaction_date'].max(), df['store_location'].unique(), categories, types)
+    aggregator = IncrementalAggregator(cube).update(*full_selection)
+
+    # Full range, one store and a week removed, and back again
+    for step in [full_selection, (start_date, end_date, stores, categories, types), full_selection]:
+        check_incremental(aggregator.update(*step), cube, step)
+
+    # Alternate between the full range and the sample selection so every run applies a change
+    flip = {'full': True}
+
+    def update():
+        if flip['full']:
+            aggregator.update(start_date, end_date, stores, categories, types)
+        else:
+            aggregator.update(*full_selection)
+        flip['full'] = not flip['full']
+    timings['filter_incremental'] = median_time(update, repeat)
+
+    def chart_data():
+        aggregator.distribution('day_of_week', 'qty')
+        aggregator.distribution('product_category', 'count')
+        aggregator.distribution('store_location', 'price')
+        hourly_density(aggregator.distribution('hour', 'count').set_index('hour')['count'])
+        return aggregator.daily_series()
+    timings['chart_data'] = median_time(chart_data, repeat)
+
+    revenue_df, price_df = chart_data()
+    jobs = {'revenue': (revenue_df, {'yearly_seasonality': True, 'daily_seasonality': True}), 'price': (price_df, {})}
+    timings['forecasts'] = median_time(lambda: forecast_service.forecast_many(jobs, periods=30, backend=forecast_backend),
+                                       repeat, setup=forecast_service.clear)
+
+    return file_format, timings
+
+
+def git_revision():
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000,1000000,10000000', help="comma-separated row counts")
+    parser.add_argument('--format', default='parquet', choices=['xlsx', 'parquet', 'feather', 'csv'],
+                        help="upload format process_file is timed on")
+    parser.add_argument('--forecast-backend', default='holt_winters', help="forecast backend to time")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per measurement (median is reported)")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(r['rows'], r['stage']): r['seconds'] for r in json.load(f)['results']}
+
+    results = []
+    print(f"{'rows':>12} {'stage':<20} {'seconds':>10} {'vs baseline':>12}")
+    with tempfile.TemporaryDirectory() as workdir:
+        shared_frames.root = os.path.join(workdir, 'shared')
+        for rows in (int(size) for size in args.sizes.split(',')):
+            file_format, timings = run_size(rows, args.format, args.forecast_backend, args.repeat, workdir)
+            for stage, seconds in timings.items():
+                results.append({'rows': rows, 'stage': stage, 'seconds': seconds, 'format': file_format})
+                previous = baseline.get((rows, stage))
+                change = f"{previous / seconds:>11.2f}x" if previous else ''
+                print(f"{rows:>12,} {stage:<20} {seconds:>10.4f} {change:>12}")
+
+    if args.json:
+        report = {
+            'meta': {
+                'revision': git_revision(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'cpus': os.cpu_count(),
+                'forecast_backend': args.forecast_backend,
+                'repeat': args.repeat,
+            },
+            'results': results,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
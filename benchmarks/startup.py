@@ -0,0 +1,89 @@
+"""Cold-start benchmark for the dashboard.
+
+Reports the import time of each heavy module in a fresh interpreter, and the
+time until the splash page has been rendered by a fresh run of Main.py.
+
+    python benchmarks/startup.py [--repeat 5] [--json startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules Main.py used to import at the top, plus the app's own modules
+MODULES = [
+    'streamlit', 'pandas', 'numpy', 'altair', 'PIL.Image', 'seaborn', 'matplotlib.pyplot',
+    'prophet', 'statsmodels.tsa.holtwinters', 'openpyxl',
+    'data_loader', 'metrics', 'forecasting',
+]
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+# Import time of one module in a new interpreter, or None if it is not installed
+def time_import(module):
+    result = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET.format(module=module)],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+# Time until the splash page is rendered. Uses Streamlit's AppTest when available;
+# older Streamlit versions run the script in bare mode, which executes the same code
+# path without a browser attached.
+def time_first_paint():
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        AppTest = None
+
+    start = time.perf_counter()
+    if AppTest is not None:
+        AppTest.from_file(os.path.join(ROOT, 'Main.py'), default_timeout=60).run()
+        return time.perf_counter() - start
+    result = subprocess.run([sys.executable, 'Main.py'], cwd=ROOT, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        return None
+    return elapsed
+
+
+def run(repeat):
+    report = {'imports': {}, 'first_paint': None}
+    for module in MODULES:
+        samples = [time_import(module) for _ in range(repeat)]
+        samples = [s for s in samples if s is not None]
+        report['imports'][module] = statistics.median(samples) if samples else None
+
+    paints = [time_first_paint() for _ in range(repeat)]
+    paints = [p for p in paints if p is not None]
+    report['first_paint'] = statistics.median(paints) if paints else None
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help="runs per measurement (median is reported)")
+    parser.add_argument('--json', help="write the results to this file")
+    args = parser.parse_args()
+
+    report = run(args.repeat)
+    for module, seconds in report['imports'].items():
+        value = "not installed" if seconds is None else f"{seconds * 1000:8.0f} ms"
+        print(f"import {module:<28} {value}")
+    paint = report['first_paint']
+    print(f"{'splash first paint':<35} " + ("failed" if paint is None else f"{paint * 1000:8.0f} ms"))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""Synthetic coffee-shop transactions with the schema of the Transactions sheet.
+
+Store names come from Faker; products, prices and the hourly, weekly and monthly
+seasonality follow the coffee-shop workbook the dashboard was built around.
+
+    python benchmarks/synthetic.py 100000 transactions.xlsx [--seed 0] [--stores 3] [--months 6]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# category -> type -> (product, base price); drinks come in a regular and a large size
+CATALOG = {
+    'Coffee': {
+        'Barista Espresso': [('Latte', 3.0), ('Cappuccino', 3.25), ('Espresso shot', 2.5)],
+        'Gourmet brewed coffee': [('Columbian Medium Roast', 2.5), ('Ethiopia', 2.75)],
+        'Drip coffee': [('Our Old Time Diner Blend', 2.25)],
+        'Organic brewed coffee': [('Brazilian', 2.75)],
+        'Premium brewed coffee': [('Jamaican Coffee River', 3.25)],
+    },
+    'Tea': {
+        'Brewed Chai tea': [('Spicy Eye Opener Chai', 2.75), ('Morning Sunrise Chai', 2.5)],
+        'Brewed Black tea': [('Earl Grey', 2.5), ('English Breakfast', 2.5)],
+        'Brewed herbal tea': [('Lemon Grass', 2.5), ('Peppermint', 2.5)],
+        'Brewed Green tea': [('Serenity Green Tea', 2.5)],
+    },
+    'Drinking Chocolate': {
+        'Hot chocolate': [('Dark chocolate', 4.0), ('Sustainably Grown Organic', 4.25)],
+    },
+    'Bakery': {
+        'Scone': [('Oatmeal Scone', 3.0), ('Jumbo Savory Scone', 3.75)],
+        'Biscotti': [('Chocolate Chip Biscotti', 3.5)],
+        'Pastry': [('Croissant', 3.5), ('Chocolate Croissant', 3.75)],
+    },
+    'Flavours': {
+        'Regular syrup': [('Carmel syrup', 0.8), ('Hazelnut syrup', 0.8)],
+        'Sugar free syrup': [('Sugar Free Vanilla syrup', 0.8)],
+    },
+    'Coffee beans': {
+        'Espresso Beans': [('Primo Espresso Roast', 20.0)],
+        'Organic Beans': [('Organic Decaf Blend', 24.0)],
+    },
+}
+SIZED_CATEGORIES = {'Coffee', 'Tea', 'Drinking Chocolate'}
+
+# Share of transactions per category
+CATEGORY_WEIGHTS = {'Coffee': 0.39, 'Tea': 0.30, 'Drinking Chocolate': 0.08, 'Bakery': 0.15, 'Flavours': 0.06, 'Coffee beans': 0.02}
+
+# Relative traffic per opening hour (6:00-20:59), with the morning rush at 8-10
+HOURLY_WEIGHTS = dict(zip(range(6, 21), [3, 6, 10, 10, 10, 6, 5, 5, 5, 5, 5, 5, 5, 4, 2]))
+
+# Relative traffic per weekday, Monday first
+WEEKDAY_WEIGHTS = [1.0, 1.0, 1.01, 1.02, 1.03, 0.95, 0.93]
+
+# Traffic grows by this fraction per month, as in the source data
+MONTHLY_GROWTH = 0.15
+
+# Largest sheet Excel can hold, header row excluded
+EXCEL_MAX_ROWS = 1048575
+
+
+# Flat product table: one row per product (and size) with its ids, labels and price
+def product_table():
+    rows = []
+    for category, types in CATALOG.items():
+        for product_type, products in types.items():
+            for name, price in products:
+                sizes = [(' Rg', price), (' Lg', price + 0.5)] if category in SIZED_CATEGORIES else [('', price)]
+                for suffix, size_price in sizes:
+                    rows.append({'product_category': category, 'product_type': product_type,
+                                 'product_detail': name + suffix, 'unit_price': size_price})
+    products = pd.DataFrame(rows)
+    products.insert(0, 'product_id', np.arange(1, len(products) + 1))
+    return products
+
+
+# Store names from Faker, reproducible for a given seed
+def store_names(count, seed=0):
+    from faker import Faker
+
+    fake = Faker()
+    fake.seed_instance(seed)
+    names = []
+    while len(names) < count:
+        name = fake.city()
+        if name not in names:
+            names.append(name)
+    return names
+
+
+# "HH:MM:SS" text for seconds since midnight, built from the digits without per-row formatting
+def _time_text(seconds):
+    parts = np.stack([seconds // 3600, seconds // 60 % 60, seconds % 60], axis=1)
+    digits = np.stack([parts // 10, parts % 10], axis=2).reshape(-1, 6) + ord('0')
+    raw = np.full((len(seconds), 8), ord(':'), dtype=np.uint8)
+    raw[:, [0, 1, 3, 4, 6, 7]] = digits
+    return raw.view('S8').ravel().astype('U8').astype(object)
+
+
+def generate_transactions(rows, seed=0, stores=3, start='2023-01-01', months=6):
+    rng = np.random.default_rng(seed)
+
+    # Days weighted by weekday and by the monthly growth trend
+    days = pd.date_range(start, pd.Timestamp(start) + pd.DateOffset(months=months) - pd.Timedelta(days=1), freq='D')
+    trend = (1 + MONTHLY_GROWTH) ** ((days - days[0]).days.to_numpy() / 30.4)
+    day_weights = np.asarray(WEEKDAY_WEIGHTS)[days.dayofweek] * trend
+    day = rng.choice(len(days), rows, p=day_weights / day_weights.sum())
+
+    hours = np.array(list(HOURLY_WEIGHTS))
+    hour_weights = np.array(list(HOURLY_WEIGHTS.values()), dtype=float)
+    seconds = rng.choice(hours, rows, p=hour_weights / hour_weights.sum()) * 3600 + rng.integers(0, 3600, rows)
+
+    # Stores differ in size; the busiest sells roughly 1.3x the quietest
+    store_weights = rng.uniform(1.0, 1.3, stores)
+    store = rng.choice(stores, rows, p=store_weights / store_weights.sum())
+
+    # Categories by share, then a uniformly chosen product within the category
+    products = product_table()
+    category_names = list(CATEGORY_WEIGHTS)
+    category_p = np.array(list(CATEGORY_WEIGHTS.values()))
+    category = rng.choice(len(category_names), rows, p=category_p / category_p.sum())
+    product = np.empty(rows, dtype=np.int64)
+    for code, name in enumerate(category_names):
+        members = np.flatnonzero(products['product_category'].to_numpy() == name)
+        mask = category == code
+        product[mask] = rng.choice(members, mask.sum())
+
+    # Most tickets are a single item; food and beans rarely go above one
+    qty = rng.choice([1, 2, 3], rows, p=[0.6, 0.35, 0.05])
+    single = np.isin(category, [category_names.index('Bakery'), category_names.index('Coffee beans')])
+    qty[single & (rng.random(rows) < 0.8)] = 1
+
+    order = np.lexsort((seconds, day))
+    day, seconds, store, product, qty = day[order], seconds[order], store[order], product[order], qty[order]
+    names = np.asarray(store_names(stores, seed), dtype=object)
+    return pd.DataFrame({
+        'transaction_id': np.arange(1, rows + 1),
+        'transaction_date': days[day],
+        'transaction_time': _time_text(seconds),
+        'transaction_qty': qty,
+        'store_id': store + 1,
+        'store_location': names[store],
+        'product_id': products['product_id'].to_numpy()[product],
+        'unit_price': products['unit_price'].to_numpy()[product],
+        'product_category': products['product_category'].to_numpy(dtype=object)[product],
+        'product_type': products['product_type'].to_numpy(dtype=object)[product],
+        'product_detail': products['product_detail'].to_numpy(dtype=object)[product],
+    })
+
+
+# Write transactions in the format given by the file extension (xlsx, parquet, feather or csv)
+def write_transactions(df, path):
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext == 'xlsx':
+        if len(df) > EXCEL_MAX_ROWS:
+            raise ValueError(f"Excel sheets hold at most {EXCEL_MAX_ROWS:,} rows")
+        df.to_excel(path, sheet_name='Transactions', index=False)
+    elif ext == 'parquet':
+        df.to_parquet(path, index=False)
+    elif ext == 'feather':
+        df.to_feather(path)
+    elif ext == 'csv':
+        df.to_csv(path, index=False)
+    else:
+        raise ValueError(f"Unsupported file format: {ext}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('rows', type=int, help="number of transactions")
+    parser.add_argument('path', help="output file (.xlsx, .parquet, .feather or .csv)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stores', type=int, default=3)
+    parser.add_argument('--months', type=int, default=6)
+    args = parser.parse_args()
+
+    df = generate_transactions(args.rows, seed=args.seed, stores=args.stores, months=args.months)
+    write_transactions(df, args.path)
+    print(f"Wrote {len(df):,} transactions to {args.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Charts are fed pre-aggregated tables (from the aggregator or the query engine), so the
+# Vega-Lite spec carries one row per bar or slice instead of every transaction
+
+# Gaussian KDE of transaction hours computed from per-hour counts, matching
+# sns.kdeplot(hours, bw_adjust=bw_adjust) on the rows (Scott's rule bandwidth).
+# Each of the 24 bins contributes one kernel, so the cost does not grow with the row count.
+def hourly_density(hour_counts, bw_adjust=0.5, points=200):
+    hours = np.asarray(hour_counts.index, dtype=float)
+    counts = np.asarray(hour_counts.values, dtype=float)
+    n = counts.sum()
+    if n == 0:
+        return pd.DataFrame({'hour': [], 'density': []})
+    mean = np.dot(counts, hours) / n
+    std = np.sqrt(np.dot(counts, (hours - mean) ** 2) / max(n - 1, 1))
+    bandwidth = max(bw_adjust * std * n ** (-1 / 5), 1e-3)
+    grid = np.linspace(hours.min() - 3 * bandwidth, hours.max() + 3 * bandwidth, points)
+    kernel = np.exp(-0.5 * ((grid[:, None] - hours[None, :]) / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    return pd.DataFrame({'hour': grid, 'density': kernel @ counts / n})
+
+# Size of the chart spec, inlined data included, that is sent to the browser
+def chart_payload_bytes(chart):
+    return len(chart.to_json().encode())
+
+def payload_caption(chart):
+    return f"Chart payload: {chart_payload_bytes(chart) / 1024:,.1f} KB"
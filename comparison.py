@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Dimensions and measures the Analytics page can compare files on, with display names
+COMPARE_DIMENSIONS = {
+    'product_detail': "Product",
+    'store_location': "Store",
+    'day': "Day",
+}
+COMPARE_MEASURES = {
+    'revenue': "Revenue",
+    'transaction_qty': "Items sold",
+    'count': "Transactions",
+}
+
+# Display names for the uploads, made unique when two files share a name
+def file_labels(uploaded_files):
+    labels = []
+    for i, uploaded_file in enumerate(uploaded_files):
+        name = getattr(uploaded_file, 'name', None) or os.path.basename(str(uploaded_file))
+        label = os.path.splitext(name)[0]
+        labels.append(label if label not in labels else f"{label} ({i + 1})")
+    return labels
+
+# Headline totals of every file, one row per file, with the change against the first file
+def file_totals(cubes, labels):
+    totals = pd.DataFrame({
+        'count': [int(cube['count'].sum()) for cube in cubes],
+        'transaction_qty': [int(cube['transaction_qty'].sum()) for cube in cubes],
+        'price_sum': [float(cube['unit_price'].sum()) for cube in cubes],
+        'revenue': [float(cube['revenue'].sum()) for cube in cubes],
+    }, index=pd.Index(labels, name='file'))
+    for column in ['count', 'price_sum', 'revenue']:
+        totals[f'{column}_delta'] = totals[column] - totals[column].iloc[0]
+    return totals
+
+# Per-file totals of `measure` by `dimension`, aligned on the dimension values in one outer
+# join, with the absolute and relative change of every file against the first one.
+# Each file is reduced from its cube, so the cost grows with the number of cube cells,
+# not with the number of transactions.
+def compare_files(cubes, labels, dimension, measure='revenue'):
+    parts = []
+    for cube in cubes:
+        part = cube.groupby(dimension, observed=True)[measure].sum()
+        # Categorical indexes with different categories would not align, so join on the labels
+        if isinstance(part.index, pd.CategoricalIndex):
+            part.index = part.index.astype(object)
+        parts.append(part)
+    wide = pd.concat(parts, axis=1, keys=labels, join='outer').fillna(0).sort_index()
+    wide.index.name = dimension
+
+    baseline = wide[labels[0]].to_numpy()
+    deltas = wide[labels[1:]].to_numpy() - baseline[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        changes = np.where(baseline[:, None] != 0, deltas / baseline[:, None] * 100, np.nan)
+    for i, label in enumerate(labels[1:]):
+        wide[f'{label} Δ'] = deltas[:, i]
+        wide[f'{label} Δ%'] = changes[:, i]
+    return wide
@@ -0,0 +1,309 @@
+import hashlib
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from forecasting import worker_context
+from shared_frames import shared_frames
+
+# Columns the dashboard reads; columnar formats load only these
+DASHBOARD_COLUMNS = [
+    'transaction_date', 'transaction_time', 'transaction_qty', 'unit_price',
+    'store_location', 'product_category', 'product_type', 'product_detail',
+]
+
+# Loaded from columnar formats as well when the file has them; the dataset store
+# deduplicates appended rows on transaction_id
+OPTIONAL_COLUMNS = ['transaction_id']
+
+# Repeated labels stored as pandas categoricals by compact_schema
+CATEGORY_COLUMNS = ['store_location', 'product_category', 'product_type', 'product_detail', 'day_of_week']
+
+# Integer columns downcast to the smallest type that holds their values
+INTEGER_COLUMNS = ['transaction_id', 'transaction_qty', 'store_id', 'product_id']
+
+# File types accepted by the uploaders
+UPLOAD_TYPES = ["xlsx", "parquet", "feather", "csv"]
+
+# Read the raw bytes of a Streamlit upload or a local path
+def read_bytes(uploaded_file):
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        with open(uploaded_file, 'rb') as f:
+            return f.read()
+    if hasattr(uploaded_file, 'getvalue'):
+        return uploaded_file.getvalue()
+    uploaded_file.seek(0)
+    return uploaded_file.read()
+
+# Hash used as the cache key for an upload
+def file_fingerprint(data):
+    return hashlib.sha256(data).hexdigest()
+
+# Columns derived from transaction_date and transaction_time by finish_frame
+DERIVED_COLUMNS = ['transaction_seconds', 'transaction_timestamp', 'hour', 'weekday', 'month', 'day_of_week']
+
+# Weekday names in the order of dt.dayofweek (0 = Monday)
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Seconds since midnight of time-of-day values, NaN where missing or unparseable. Excel
+# gives datetime.time objects or "HH:MM:SS" text, CSV gives text and Parquet exports hold
+# strings; all of them go through one vectorized to_timedelta call.
+def time_of_day_seconds(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return (values - values.dt.normalize()).dt.total_seconds()
+    if pd.api.types.is_timedelta64_dtype(values):
+        return values.dt.total_seconds()
+    if pd.api.types.is_numeric_dtype(values):
+        # Excel serial times are fractions of a day
+        return values.astype(float) * 86400
+    if pd.api.types.infer_dtype(values, skipna=False) == 'string':
+        seconds = _hhmmss_seconds(values.to_numpy())
+        if seconds is not None:
+            return pd.Series(seconds, index=values.index, dtype=float)
+    text = values.astype(str).where(values.notna())
+    return pd.to_timedelta(text, errors='coerce').dt.total_seconds()
+
+# Fast path for text that is all exactly "HH:MM:SS": the digits are read straight from the
+# byte buffer. Returns None when any value has another layout.
+def _hhmmss_seconds(values):
+    try:
+        raw = np.array(values, dtype='S9').view(np.uint8).reshape(-1, 9)
+    except UnicodeEncodeError:
+        return None
+    digits = raw[:, [0, 1, 3, 4, 6, 7]].astype(np.int32) - ord('0')
+    if not ((raw[:, [2, 5]] == ord(':')).all() and (raw[:, 8] == 0).all() and ((digits >= 0) & (digits <= 9)).all()):
+        return None
+    hours = digits[:, 0] * 10 + digits[:, 1]
+    minutes = digits[:, 2] * 10 + digits[:, 3]
+    seconds = digits[:, 4] * 10 + digits[:, 5]
+    return hours * 3600 + minutes * 60 + seconds
+
+# Add the typed date and time columns every page relies on, in one pass: time of day
+# as integer seconds, the full transaction timestamp, and hour, weekday and month as
+# small integer codes. day_of_week is a categorical built from the weekday codes, so
+# no per-row Python objects are created.
+def finish_frame(df):
+    df['transaction_date'] = pd.to_datetime(df['transaction_date'])
+    date = df['transaction_date'].dt.normalize()
+    if 'transaction_time' in df:
+        seconds = time_of_day_seconds(df['transaction_time'])
+        # Rows without a usable time keep whatever time of day the date carries
+        seconds = seconds.fillna(time_of_day_seconds(df['transaction_date']))
+    else:
+        seconds = time_of_day_seconds(df['transaction_date'])
+    seconds = seconds.round()
+    df['transaction_seconds'] = seconds.astype('int32') if seconds.notna().all() else seconds.astype('float32')
+    df['transaction_timestamp'] = date + pd.to_timedelta(seconds, unit='s')
+    df['hour'] = (seconds // 3600).astype('int8') if seconds.notna().all() else seconds // 3600
+    weekday = date.dt.dayofweek
+    df['weekday'] = weekday.astype('int8') if weekday.notna().all() else weekday
+    df['month'] = date.dt.month.astype('int8') if date.notna().all() else date.dt.month
+    df['day_of_week'] = pd.Categorical.from_codes(weekday.fillna(-1).astype('int8'), DAY_NAMES)
+    return df
+
+# Bytes a column would take in pandas' default types: 64-bit numbers and object strings.
+# finish_frame already builds hour, weekday, month and day_of_week compactly, so their
+# actual size is not a fair baseline.
+def default_type_bytes(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(series.cat.categories))
+        sizes = np.array([sys.getsizeof(value) for value in series.cat.categories], dtype=np.int64)
+        # One pointer per row plus the label object it points to, as memory_usage(deep=True) counts it
+        return 8 * len(series) + int(counts @ sizes)
+    if series.dtype.kind in 'iuf' and series.dtype.itemsize < 8:
+        return 8 * len(series)
+    return int(series.memory_usage(deep=True, index=False))
+
+# Shrink a parsed frame: categoricals for the label columns, the smallest integer types,
+# and float32 prices when that loses nothing. The per-column sizes in pandas' default
+# types are kept in df.attrs as the "before" of memory_report.
+def compact_schema(df):
+    before = {column: default_type_bytes(df[column]) for column in df}
+    for column in CATEGORY_COLUMNS:
+        if column in df and df[column].dtype == object:
+            df[column] = df[column].astype('category')
+    for column in INTEGER_COLUMNS:
+        if column in df and pd.api.types.is_integer_dtype(df[column]):
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+    if 'unit_price' in df and df['unit_price'].dtype == 'float64':
+        price = df['unit_price'].astype('float32')
+        if np.array_equal(price.to_numpy(dtype='float64'), df['unit_price'].to_numpy(), equal_nan=True):
+            df['unit_price'] = price
+    df.attrs['memory_before'] = before
+    return df
+
+# Bytes per column in pandas' default types (before) and in the compact schema (after)
+def memory_report(df):
+    after = df.memory_usage(deep=True, index=False)
+    before = pd.Series(df.attrs.get('memory_before', {}), dtype='float64')
+    report = pd.DataFrame({'before': before, 'after': after}).fillna(0).astype('int64')
+    report.index.name = 'column'
+    return report
+
+# Parse the Transactions sheet into a typed DataFrame
+def parse_workbook(source):
+    df = pd.read_excel(source, sheet_name="Transactions")
+    return finish_frame(df)
+
+# Walk the Transactions sheet row by row and yield typed chunks, so memory stays
+# bounded by chunk_size instead of the size of the workbook
+def iter_workbook_chunks(uploaded_file, chunk_size=50000):
+    from openpyxl import load_workbook
+
+    if hasattr(uploaded_file, 'seek'):
+        uploaded_file.seek(0)
+    wb = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        rows = wb["Transactions"].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                yield finish_frame(pd.DataFrame(batch, columns=header))
+                batch = []
+        if batch:
+            yield finish_frame(pd.DataFrame(batch, columns=header))
+    finally:
+        wb.close()
+
+# Column names of a Parquet or Feather file, read from its schema only
+def _schema_names(source, file_format):
+    import pyarrow.parquet as pq
+    import pyarrow.ipc as ipc
+
+    names = (pq.ParquetFile(source).schema_arrow if file_format == 'parquet' else ipc.open_file(source).schema).names
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return names
+
+# Read a Parquet, Feather or CSV export, loading only the dashboard columns plus the
+# optional ones the file has
+def parse_columnar(source, file_format, columns=DASHBOARD_COLUMNS, optional=OPTIONAL_COLUMNS):
+    if file_format in ('parquet', 'feather'):
+        names = _schema_names(source, file_format)
+        columns = list(columns) + [column for column in optional if column in names]
+        read = pd.read_parquet if file_format == 'parquet' else pd.read_feather
+        df = read(source, columns=columns)
+    elif file_format == 'csv':
+        wanted = set(columns) | set(optional)
+        df = pd.read_csv(source, usecols=lambda column: column in wanted)
+        missing = [column for column in columns if column not in df]
+        if missing:
+            raise ValueError(f"CSV file is missing columns: {missing}")
+    else:
+        raise ValueError(f"Unsupported file format: {file_format}")
+    return finish_frame(df)
+
+# Work out the format of an upload from its file name
+def file_format(uploaded_file):
+    name = uploaded_file if isinstance(uploaded_file, (str, os.PathLike)) else getattr(uploaded_file, 'name', '')
+    ext = os.path.splitext(str(name))[1].lower().lstrip('.')
+    return 'xlsx' if ext in ('', 'xls', 'xlsm') else ext
+
+# Time-of-day values come back from openpyxl as a mix of types (datetime.time and text),
+# which Arrow cannot store in one column; keep them as text, with missing values as nulls.
+# transaction_seconds and transaction_timestamp carry the parsed times.
+def time_as_text(df):
+    if 'transaction_time' in df and df['transaction_time'].dtype == object:
+        df['transaction_time'] = df['transaction_time'].astype(str).where(df['transaction_time'].notna())
+    return df
+
+# Parse the bytes of an upload into a compact typed frame, ready for the shared registry.
+# Frames are published under shared_frames.FRAME_VERSION; bump it when this output changes.
+def parse_upload(data, fmt):
+    if fmt == 'xlsx':
+        df = parse_workbook(io.BytesIO(data))
+    else:
+        df = parse_columnar(io.BytesIO(data), fmt)
+    return time_as_text(compact_schema(df))
+
+# Parse an upload and return (content key, frame). The upload is parsed once per host:
+# the frame is published to the shared registry and every session opening the same bytes
+# maps the same file. `holder` (a session id) takes a lease that keeps the frame mapped
+# while it is in use. The key is shared by the caches built on top of the parsed frame.
+def process_upload(uploaded_file, holder=None):
+    data = read_bytes(uploaded_file)
+    key = file_fingerprint(data)
+    df = shared_frames.acquire(key, holder)
+    if df is None:
+        shared_frames.publish(key, parse_upload(data, file_format(uploaded_file)))
+        df = shared_frames.acquire(key, holder)
+    # Callers add and overwrite columns; a shallow copy keeps that off the shared frame
+    return key, df.copy(deep=False)
+
+# Process file function, for callers that only need the frame
+def process_file(uploaded_file, holder=None):
+    return process_upload(uploaded_file, holder)[1]
+
+# Worker processes for parsing several uploads at once, started on first use
+_parse_executor = None
+_parse_lock = threading.Lock()
+
+def _parse_pool():
+    global _parse_executor
+    with _parse_lock:
+        if _parse_executor is None:
+            _parse_executor = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=worker_context())
+        return _parse_executor
+
+# Pool entry point: parse an upload and publish it, so only the key travels back
+def _parse_and_publish(key, data, fmt):
+    shared_frames.publish(key, parse_upload(data, fmt))
+    return key
+
+# Parse several uploads at once and return (content key, frame) pairs in upload order.
+# Uploads already in the shared registry are mapped from it; when more than one needs
+# parsing, they are parsed concurrently in worker processes, since the Excel reader is
+# pure Python and holds the GIL. The workers publish the frames themselves, so nothing
+# is pickled back. The frames are the shared ones and must be treated as read-only.
+def process_files(uploaded_files, holder=None):
+    keys = []
+    frames = {}
+    pending = {}
+    for uploaded_file in uploaded_files:
+        data = read_bytes(uploaded_file)
+        key = file_fingerprint(data)
+        keys.append(key)
+        if key in frames or key in pending:
+            continue
+        df = shared_frames.acquire(key, holder)
+        if df is None:
+            pending[key] = (data, file_format(uploaded_file))
+        else:
+            frames[key] = df
+
+    if len(pending) == 1:
+        (key, (data, fmt)), = pending.items()
+        _parse_and_publish(key, data, fmt)
+        frames[key] = shared_frames.acquire(key, holder)
+    elif pending:
+        pool = _parse_pool()
+        futures = [pool.submit(_parse_and_publish, key, data, fmt) for key, (data, fmt) in pending.items()]
+        for future in as_completed(futures):
+            key = future.result()
+            frames[key] = shared_frames.acquire(key, holder)
+    return [(key, frames[key]) for key in keys]
+
+# Source columns of a parsed frame, ready to be written to a columnar file; the derived
+# columns are rebuilt by finish_frame when the file is read back
+def storage_frame(df):
+    df = df.drop(columns=[column for column in DERIVED_COLUMNS if column in df])
+    return time_as_text(df)
+
+# One-time conversion of a workbook to Parquet, returned as bytes ready for download
+def convert_to_parquet(uploaded_file):
+    df = storage_frame(process_file(uploaded_file))
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
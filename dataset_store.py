@@ -0,0 +1,174 @@
+"""Persistent transactions dataset that monthly workbooks are appended to.
+
+    python dataset_store.py <dataset> <folder or files...>
+
+Each dataset is a folder of Parquet files partitioned by month, plus a manifest of the
+uploads already ingested. Rows are deduplicated on transaction_id, so re-exported or
+overlapping workbooks can be appended safely.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from shared_frames import shared_frames
+from data_loader import (UPLOAD_TYPES, compact_schema, finish_frame, process_files,
+                         storage_frame)
+
+# Where datasets live unless BSA_STORE_DIR says otherwise
+STORE_DIR = os.environ.get("BSA_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'store'))
+
+# Fixed column types, so every partition file shares one schema
+STORE_DTYPES = {
+    'transaction_id': 'int64',
+    'transaction_qty': 'int32',
+    'store_id': 'int32',
+    'product_id': 'int32',
+    'unit_price': 'float64',
+}
+
+
+class DatasetStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    # Dataset names become folder names, so they are kept to a safe alphabet
+    @staticmethod
+    def check_name(dataset):
+        if not re.fullmatch(r'[A-Za-z0-9_-]+', dataset):
+            raise ValueError(f"Dataset names may only contain letters, digits, '-' and '_': {dataset!r}")
+
+    def _path(self, dataset, *parts):
+        self.check_name(dataset)
+        return os.path.join(self.root, dataset, *parts)
+
+    def _manifest(self, dataset):
+        path = self._path(dataset, 'manifest.json')
+        if not os.path.exists(path):
+            return {'files': {}, 'parts': []}
+        with open(path) as f:
+            return json.load(f)
+
+    # The manifest is replaced atomically, after the partition files it lists are in place
+    def _write_manifest(self, dataset, manifest):
+        path = self._path(dataset, 'manifest.json')
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, path)
+
+    def datasets(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.exists(os.path.join(self.root, name, 'manifest.json')))
+
+    # Content key of the dataset's current state, shared by the caches built on top of it
+    def dataset_key(self, dataset):
+        manifest = self._manifest(dataset)
+        return hashlib.sha256(repr((dataset, sorted(manifest['parts']))).encode()).hexdigest()
+
+    def _existing_ids(self, dataset, manifest):
+        if not manifest['parts']:
+            return np.array([], dtype='int64')
+        import pyarrow.parquet as pq
+
+        files = [self._path(dataset, part) for part in manifest['parts']]
+        return pq.ParquetDataset(files).read(columns=['transaction_id']).column(0).to_numpy()
+
+    # Append one parsed upload. Returns the number of new transactions written; an upload
+    # whose content was ingested before is skipped without reading the existing rows.
+    def append(self, dataset, key, df, name=None):
+        if 'transaction_id' not in df:
+            raise ValueError("Uploads need a transaction_id column to be added to a dataset")
+        with self._lock:
+            manifest = self._manifest(dataset)
+            if key in manifest['files']:
+                return 0
+            rows = storage_frame(df)
+            # Plain strings and fixed integer widths, whatever the upload's compact schema chose
+            rows = rows.astype({column: object for column in rows if isinstance(rows[column].dtype, pd.CategoricalDtype)})
+            rows = rows.astype({column: dtype for column, dtype in STORE_DTYPES.items() if column in rows})
+            rows = rows.drop_duplicates('transaction_id')
+            rows = rows[~rows['transaction_id'].isin(self._existing_ids(dataset, manifest))]
+
+            os.makedirs(self._path(dataset), exist_ok=True)
+            for month, part in rows.groupby(rows['transaction_date'].dt.strftime('%Y-%m')):
+                relative = os.path.join(month, f"part-{key[:16]}.parquet")
+                path = self._path(dataset, relative)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                part.to_parquet(tmp, index=False)
+                os.replace(tmp, path)
+                manifest['parts'].append(relative)
+            manifest['files'][key] = {'name': name, 'rows': int(len(rows)), 'ingested_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+            self._write_manifest(dataset, manifest)
+            return len(rows)
+
+    # Parse several uploads (concurrently) and append them in order. A bad dataset name
+    # is rejected before anything is parsed.
+    def append_files(self, dataset, uploaded_files):
+        self.check_name(dataset)
+        added = 0
+        for uploaded_file, (key, df) in zip(uploaded_files, process_files(uploaded_files)):
+            name = getattr(uploaded_file, 'name', None) or os.path.basename(str(uploaded_file))
+            added += self.append(dataset, key, df, name)
+        return added
+
+    # Append every supported file in a folder, e.g. a year of monthly exports
+    def append_folder(self, dataset, folder):
+        files = sorted(path for ext in UPLOAD_TYPES for path in glob.glob(os.path.join(folder, f"*.{ext}")))
+        return self.append_files(dataset, files)
+
+    # The whole dataset as a typed, compact frame. Only the Parquet partitions are read,
+    # and the result is shared like a parsed upload until the dataset changes.
+    def load(self, dataset, holder=None):
+        if not self._manifest(dataset)['parts']:
+            raise ValueError(f"Dataset {dataset!r} has no transactions yet")
+        key = self.dataset_key(dataset)
+        df = shared_frames.acquire(key, holder)
+        if df is None:
+            import pyarrow.parquet as pq
+
+            manifest = self._manifest(dataset)
+            files = [self._path(dataset, part) for part in manifest['parts']]
+            df = pq.ParquetDataset(files).read().to_pandas()
+            df = compact_schema(finish_frame(df.sort_values(['transaction_date', 'transaction_id'], ignore_index=True)))
+            shared_frames.publish(key, df)
+            df = shared_frames.acquire(key, holder)
+        # Callers add and overwrite columns; a shallow copy keeps that off the shared frame
+        return df.copy(deep=False)
+
+    # Uploads that went into the dataset, newest last
+    def history(self, dataset):
+        files = self._manifest(dataset)['files']
+        return pd.DataFrame([{'file': entry['name'], 'new_transactions': entry['rows'], 'ingested_at': entry['ingested_at']}
+                             for entry in files.values()])
+
+
+# Shared by every session in the Streamlit process
+dataset_store = DatasetStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dataset', help="name of the dataset to append to")
+    parser.add_argument('paths', nargs='+', help="workbooks, or folders of workbooks")
+    parser.add_argument('--root', default=STORE_DIR, help="store directory")
+    args = parser.parse_args()
+
+    store = DatasetStore(args.root)
+    for path in args.paths:
+        added = store.append_folder(args.dataset, path) if os.path.isdir(path) else store.append_files(args.dataset, [path])
+        print(f"{path}: {added:,} new transactions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+# Hash of the frames and parameters a figure is drawn from
+def figure_fingerprint(frames, params):
+    digest = hashlib.sha256()
+    for frame in frames:
+        digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    digest.update(repr(sorted(params.items())).encode())
+    return digest.hexdigest()
+
+
+# Rendered matplotlib figures as PNG bytes, bounded by their total size with LRU eviction.
+# A figure is closed as soon as it has been rasterized, so pyplot never holds on to it.
+class FigureCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    # PNG bytes for `key`, drawing the figure with draw() only when it is not cached
+    def render(self, key, draw, dpi=100):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        import matplotlib.pyplot as plt
+
+        fig = draw()
+        try:
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+        finally:
+            plt.close(fig)
+        png = buffer.getvalue()
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = png
+                self._size += len(png)
+            # The newest figure is always kept, even if it alone exceeds the budget
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+        return png
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries), 'bytes': self._size}
+
+
+# Shared by every session in the Streamlit process
+figure_cache = FigureCache()
+
+
+# PNG of model.plot(forecast), keyed by the fitted history, the forecast and the labels
+def forecast_png(model, forecast, xlabel='ds', ylabel='y'):
+    frames = [model.history[['ds', 'y']], forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]]
+    key = figure_fingerprint(frames, {'model': type(model).__name__, 'xlabel': xlabel, 'ylabel': ylabel})
+    return figure_cache.render(key, lambda: model.plot(forecast, xlabel=xlabel, ylabel=ylabel))
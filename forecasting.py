@@ -0,0 +1,357 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+# Forecast backends selectable in the dashboard; Prophet is the slow, accurate opt-in
+BACKENDS = {
+    'holt_winters': "Holt-Winters (fast)",
+    'seasonal_naive': "Seasonal naive (fastest)",
+    'prophet': "Prophet (accurate)",
+}
+DEFAULT_BACKEND = 'holt_winters'
+
+# Weekly seasonality for the fast backends, and the z-score of Prophet's default 80% interval
+SEASON_LENGTH = 7
+INTERVAL_Z = 1.2816
+
+# How often a wait on the process pool checks whether its job was cancelled
+CANCEL_POLL_SECONDS = 0.25
+
+# Background forecast jobs run at once; a thread mostly waits on the process pool, so
+# allow at least one per session expected to use the dashboard concurrently
+FORECAST_SESSIONS = int(os.environ.get("BSA_FORECAST_SESSIONS", "8"))
+
+
+# Start method for worker pools. Streamlit's server is multithreaded, and a forked child
+# inherits whatever locks other threads held at the time, so workers come from a fork
+# server (or are spawned where that is not available, e.g. on Windows) instead.
+def worker_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+# Hash of a ds/y series together with the backend, model parameters and horizon
+def series_fingerprint(series_df, params, periods, backend=DEFAULT_BACKEND):
+    hashed = pd.util.hash_pandas_object(series_df[['ds', 'y']], index=False)
+    digest = hashlib.sha256(hashed.values.tobytes())
+    digest.update(repr((backend, sorted(params.items()), periods)).encode())
+    return digest.hexdigest()
+
+
+# Result holder for the fast backends, with a plot() that mirrors Prophet's
+class FastForecastModel:
+    def __init__(self, history):
+        self.history = history
+
+    def plot(self, forecast, xlabel='ds', ylabel='y', figsize=(10, 6)):
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots(figsize=figsize)
+        ax.plot(self.history['ds'], self.history['y'], 'k.')
+        ax.plot(forecast['ds'], forecast['yhat'], ls='-', c='#0072B2')
+        ax.fill_between(forecast['ds'], forecast['yhat_lower'], forecast['yhat_upper'], color='#0072B2', alpha=0.2)
+        ax.grid(True, which='major', c='gray', ls='-', lw=1, alpha=0.2)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        fig.tight_layout()
+        return fig
+
+
+# Sorted history with gaps (e.g. days without sales in a mean series) interpolated
+def _clean_history(series_df):
+    history = series_df[['ds', 'y']].sort_values('ds').reset_index(drop=True)
+    history['y'] = history['y'].astype(float).interpolate().bfill().ffill().fillna(0.0)
+    return history
+
+
+# Build a Prophet-shaped forecast frame from in-sample fit and future values
+def _assemble(history, fitted, future, periods):
+    y = history['y'].to_numpy()
+    residuals = y - fitted
+    sigma = float(np.nanstd(residuals)) if np.isfinite(residuals).any() else 0.0
+    future_ds = pd.date_range(history['ds'].iloc[-1] + pd.Timedelta(days=1), periods=periods, freq='D')
+    # Uncertainty grows with the number of seasons ahead, as for a seasonal random walk
+    seasons_ahead = np.arange(periods) // SEASON_LENGTH + 1
+    width = INTERVAL_Z * sigma * np.concatenate([np.ones(len(y)), np.sqrt(seasons_ahead)])
+    yhat = np.concatenate([np.where(np.isfinite(fitted), fitted, y), future])
+    return pd.DataFrame({
+        'ds': np.concatenate([history['ds'].to_numpy(), future_ds.to_numpy()]),
+        'yhat': yhat,
+        'yhat_lower': yhat - width,
+        'yhat_upper': yhat + width,
+    })
+
+
+# Mean of the last few same-weekday values, fully vectorized
+def _seasonal_naive(series_df, periods, params):
+    history = _clean_history(series_df)
+    y = history['y'].to_numpy()
+    weeks = min(len(y) // SEASON_LENGTH, 4)
+    if weeks == 0:
+        profile = np.full(SEASON_LENGTH, y.mean())
+    else:
+        profile = y[-weeks * SEASON_LENGTH:].reshape(weeks, SEASON_LENGTH).mean(axis=0)
+    future = profile[np.arange(periods) % SEASON_LENGTH]
+    fitted = np.full(len(y), np.nan)
+    fitted[SEASON_LENGTH:] = y[:-SEASON_LENGTH]
+    return FastForecastModel(history), _assemble(history, fitted, future, periods)
+
+
+# Additive Holt-Winters with weekly seasonality
+def _holt_winters(series_df, periods, params):
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+    history = _clean_history(series_df)
+    y = history['y'].to_numpy()
+    if len(y) < 2 * SEASON_LENGTH:
+        return _seasonal_naive(series_df, periods, params)
+    fit = ExponentialSmoothing(y, trend='add', seasonal='add', seasonal_periods=SEASON_LENGTH,
+                               initialization_method='estimated').fit()
+    return FastForecastModel(history), _assemble(history, fit.fittedvalues, fit.forecast(periods), periods)
+
+
+def _prophet(series_df, periods, params):
+    from prophet import Prophet
+
+    model = Prophet(**params)
+    model.fit(series_df[['ds', 'y']])
+    future = model.make_future_dataframe(periods=periods)
+    return model, model.predict(future)
+
+
+# Fit a model with the chosen backend and predict `periods` days ahead.
+# Prophet parameters are ignored by the fast backends.
+def fit_and_predict(series_df, periods, params, backend=DEFAULT_BACKEND):
+    fitters = {'holt_winters': _holt_winters, 'seasonal_naive': _seasonal_naive, 'prophet': _prophet}
+    if backend not in fitters:
+        raise ValueError(f"Unknown forecast backend: {backend}")
+    return fitters[backend](series_df, periods, params)
+
+
+# Process pool entry point; fitted Prophet models travel back to the app as JSON
+def _fit_in_worker(series_df, periods, params, backend):
+    from prophet.serialize import model_to_json
+
+    start = time.perf_counter()
+    model, forecast = fit_and_predict(series_df, periods, params, backend)
+    return model_to_json(model), forecast, time.perf_counter() - start
+
+
+# Daily revenue per group as a wide frame, one continuous daily column per group
+def daily_revenue_by(df, dimension):
+    daily = df.groupby([pd.Grouper(key='transaction_date', freq='D'), dimension], observed=True)['unit_price'].sum()
+    return daily.unstack(fill_value=0).asfreq('D', fill_value=0)
+
+
+# Fits forecast models and keeps the fitted model and its prediction in an LRU,
+# so reruns that leave the daily series unchanged skip the fit entirely
+class ForecastService:
+    def __init__(self, max_entries=32, max_workers=None):
+        self.max_entries = max_entries
+        self.max_workers = max_workers or os.cpu_count()
+        self._executor = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def _store(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # Worker processes are started on first use and reused across reruns
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=worker_context())
+            return self._executor
+
+    # Fit (or reuse) a model for the series and predict `periods` days ahead
+    def forecast(self, series_df, periods=30, backend=DEFAULT_BACKEND, **params):
+        key = series_fingerprint(series_df, params, periods, backend)
+        result = self._lookup(key)
+        if result is None:
+            result = fit_and_predict(series_df, periods, params, backend)
+            self._store(key, result)
+        return result
+
+    # Fit several independent series at once. `jobs` maps a name to (series_df, params).
+    # Uncached Prophet fits run in the process pool and are collected as they finish, so
+    # the wall-clock time is that of the slowest fit rather than the sum; the fast
+    # backends are cheaper to run inline than to ship to a worker. If `timings` is given
+    # it is filled with the fit time in seconds per name (None when served from cache).
+    # Setting the `cancelled` event stops the remaining fits with CancelledError within
+    # CANCEL_POLL_SECONDS; fits that already finished stay cached.
+    def forecast_many(self, jobs, periods=30, backend=DEFAULT_BACKEND, timings=None, cancelled=None):
+        timings = {} if timings is None else timings
+        results = {}
+        pending = {}
+        for name, (series_df, params) in jobs.items():
+            key = series_fingerprint(series_df, params, periods, backend)
+            result = self._lookup(key)
+            if result is None:
+                pending[name] = (key, series_df, params)
+            else:
+                results[name] = result
+                timings[name] = None
+
+        if backend != 'prophet' or len(pending) == 1:
+            for name, (key, series_df, params) in pending.items():
+                if cancelled is not None and cancelled.is_set():
+                    raise CancelledError()
+                start = time.perf_counter()
+                results[name] = fit_and_predict(series_df, periods, params, backend)
+                timings[name] = time.perf_counter() - start
+                self._store(key, results[name])
+        elif pending:
+            from prophet.serialize import model_from_json
+
+            pool = self._pool()
+            futures = {
+                pool.submit(_fit_in_worker, series_df, periods, params, backend): (name, key)
+                for name, (key, series_df, params) in pending.items()
+            }
+            remaining = set(futures)
+            while remaining:
+                # Wake up regularly, so a cancelled job frees its thread without waiting
+                # for a fit that is already running in a worker
+                done, remaining = wait(remaining, timeout=CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                if cancelled is not None and cancelled.is_set():
+                    for waiting in remaining:
+                        waiting.cancel()
+                    raise CancelledError()
+                for future in done:
+                    name, key = futures[future]
+                    model_json, forecast, seconds = future.result()
+                    results[name] = (model_from_json(model_json), forecast)
+                    timings[name] = seconds
+                    self._store(key, results[name])
+        return results
+
+    # Fit one revenue model per value of `dimension` across all cores and return a
+    # tidy frame with group, ds, yhat, yhat_lower and yhat_upper
+    def batch_forecast(self, df, dimension, periods=30, backend=DEFAULT_BACKEND, **params):
+        wide = daily_revenue_by(df, dimension)
+        jobs = {}
+        for group in wide.columns:
+            series_df = pd.DataFrame({'ds': wide.index, 'y': wide[group].values})
+            # Prophet needs at least two observations
+            if series_df['y'].ne(0).sum() >= 2:
+                jobs[group] = (series_df, params)
+
+        results = self.forecast_many(jobs, periods=periods, backend=backend)
+        frames = []
+        for group, (_, forecast) in results.items():
+            frame = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].copy()
+            frame.insert(0, 'group', group)
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=['group', 'ds', 'yhat', 'yhat_lower', 'yhat_upper'])
+        return pd.concat(frames, ignore_index=True).sort_values(['group', 'ds'], ignore_index=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+# Shared by every session in the Streamlit process
+forecast_service = ForecastService()
+
+
+# A forecast_many call running in the background; `timings` fills in as in forecast_many
+class ForecastJob:
+    def __init__(self, key, jobs, periods, backend):
+        self.key = key
+        self.timings = {}
+        self.started = time.perf_counter()
+        self._cancelled = threading.Event()
+        self._args = (jobs, periods, backend)
+        self._future = None
+
+    def _run(self, service):
+        jobs, periods, backend = self._args
+        return service.forecast_many(jobs, periods=periods, backend=backend, timings=self.timings, cancelled=self._cancelled)
+
+    def done(self):
+        return self._future.done()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def result(self, timeout=None):
+        return self._future.result(timeout)
+
+    # Same forecasts can be served by this job unless it was cancelled or failed
+    def reusable(self):
+        if self._cancelled.is_set():
+            return False
+        return not self._future.done() or self._future.exception() is None
+
+    def cancel(self):
+        self._cancelled.set()
+        self._future.cancel()
+
+
+# Runs forecasts off the script thread, so a page can render everything else first and
+# fill in the forecasts when they are ready. Each owner (a session) has one live job: a
+# rerun that asks for the same forecasts picks up the running job instead of starting
+# over, and one that asks for different forecasts cancels the stale job.
+class ForecastRunner:
+    def __init__(self, service, max_workers=FORECAST_SESSIONS):
+        self.service = service
+        self.max_workers = max_workers
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, owner, jobs, periods=30, backend=DEFAULT_BACKEND):
+        key = tuple(sorted((name, series_fingerprint(series_df, params, periods, backend))
+                           for name, (series_df, params) in jobs.items()))
+        with self._lock:
+            # Finished jobs of other sessions are not needed any more; their fits are cached
+            for other, job in list(self._jobs.items()):
+                if other != owner and job.done():
+                    del self._jobs[other]
+            current = self._jobs.get(owner)
+            if current is not None and current.key == key and current.reusable():
+                return current
+            if current is not None:
+                current.cancel()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='forecast')
+            job = ForecastJob(key, jobs, periods, backend)
+            job._future = self._executor.submit(job._run, self.service)
+            self._jobs[owner] = job
+            return job
+
+    # Cancel an owner's job, e.g. when its session leaves the page
+    def cancel(self, owner):
+        with self._lock:
+            job = self._jobs.pop(owner, None)
+        if job is not None:
+            job.cancel()
+
+
+forecast_runner = ForecastRunner(forecast_service)
@@ -0,0 +1,386 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Columns whose quantity totals feed the KPI cards
+GROUP_COLUMNS = ['product_detail', 'product_type', 'product_category', 'hour', 'day_of_week']
+
+# Pick the best and worst rows out of per-group quantity totals
+def _metrics_from_totals(totals):
+    product_sales = totals['product_detail']
+    type_sales = totals['product_type']
+    category_sales = totals['product_category']
+    hour_sales = totals['hour'].rename(columns={'hour': 'transaction_date'})
+    day_sales = totals['day_of_week']
+    return {
+        'most_sold_product': product_sales.loc[product_sales['transaction_qty'].idxmax()],
+        'least_sold_product': product_sales.loc[product_sales['transaction_qty'].idxmin()],
+        'most_sold_type': type_sales.loc[type_sales['transaction_qty'].idxmax()],
+        'most_sold_category': category_sales.loc[category_sales['transaction_qty'].idxmax()],
+        'busiest_hour': hour_sales.loc[hour_sales['transaction_qty'].idxmax()],
+        'busiest_day': day_sales.loc[day_sales['transaction_qty'].idxmax()],
+        'most_idle_day': day_sales.loc[day_sales['transaction_qty'].idxmin()]
+    }
+
+# Weekday names in the order of the integer codes below (0 = Monday)
+DAY_NAMES = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], dtype=object)
+
+# Integer codes for hour of day and weekday straight from datetime64 values, no string hashing
+def hour_codes(dates):
+    return (dates.to_numpy(dtype='datetime64[h]').astype(np.int64) % 24, np.arange(24))
+
+def weekday_codes(dates):
+    # 1970-01-01 was a Thursday
+    return ((dates.to_numpy(dtype='datetime64[D]').astype(np.int64) + 3) % 7, DAY_NAMES)
+
+# Row of the best (or worst) group, shaped like groupby(...).sum().reset_index().loc[idx].
+# Only groups that occur are considered, and ties resolve in sorted label order like groupby.
+def _pick(column, labels, totals, present, pick, as_int):
+    candidates = np.flatnonzero(present)
+    candidates = candidates[np.argsort(labels[candidates], kind='stable')]
+    i = candidates[int(pick(totals[candidates]))]
+    total = int(totals[i]) if as_int else float(totals[i])
+    label = 'transaction_date' if column == 'hour' else column
+    return pd.Series({label: labels[i], 'transaction_qty': total})
+
+# Single-pass KPI engine. Each key column is turned into integer codes once and its
+# quantity totals come from one np.bincount, instead of a groupby per column. A key is
+# either raw values (factorized here) or a precomputed (codes, labels) pair.
+# `qty` may be per-transaction quantities or pre-aggregated cube sums.
+def _group_totals(keys, qty):
+    weights = qty.astype(float, copy=False)
+    extremes = {}
+    for column in GROUP_COLUMNS:
+        key = keys[column]
+        if isinstance(key, tuple):
+            codes, labels = key
+        else:
+            codes, labels = pd.factorize(key)
+        labels = np.asarray(labels)
+        key_weights = weights
+        if codes.size and codes.min() < 0:
+            # Missing keys are dropped, as groupby does
+            valid = codes >= 0
+            codes, key_weights = codes[valid], weights[valid]
+        totals = np.bincount(codes, weights=key_weights, minlength=len(labels))
+        counts = np.bincount(codes, minlength=len(labels))
+        extremes[column] = (labels, totals, counts)
+    return extremes
+
+def _metrics_from_extremes(extremes, as_int):
+    def pick(column, which, func):
+        labels, totals, counts = extremes[column]
+        return _pick(which, labels, totals, counts > 0, func, as_int)
+
+    return {
+        'most_sold_product': pick('product_detail', 'product_detail', np.argmax),
+        'least_sold_product': pick('product_detail', 'product_detail', np.argmin),
+        'most_sold_type': pick('product_type', 'product_type', np.argmax),
+        'most_sold_category': pick('product_category', 'product_category', np.argmax),
+        'busiest_hour': pick('hour', 'hour', np.argmax),
+        'busiest_day': pick('day_of_week', 'day_of_week', np.argmax),
+        'most_idle_day': pick('day_of_week', 'day_of_week', np.argmin)
+    }
+
+def kpi_engine(keys, qty):
+    return _metrics_from_extremes(_group_totals(keys, qty), np.issubdtype(qty.dtype, np.integer))
+
+# Categorical columns already carry integer codes; anything else is factorized by the engine
+def _label_key(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy().astype(np.intp), series.cat.categories.to_numpy()
+    return series.to_numpy()
+
+# Integer-coded keys of a transactions frame. Frames from data_loader carry hour (from
+# transaction_time) and weekday codes already; otherwise they come from transaction_date.
+def _row_keys(df):
+    keys = {column: _label_key(df[column]) for column in ['product_detail', 'product_type', 'product_category']}
+    if 'hour' in df and pd.api.types.is_integer_dtype(df['hour']):
+        keys['hour'] = (df['hour'].to_numpy().astype(np.intp), np.arange(24))
+    else:
+        keys['hour'] = hour_codes(df['transaction_date'])
+    if 'weekday' in df and pd.api.types.is_integer_dtype(df['weekday']):
+        keys['day_of_week'] = (df['weekday'].to_numpy().astype(np.intp), DAY_NAMES)
+    else:
+        keys['day_of_week'] = weekday_codes(df['transaction_date'])
+    return keys
+
+# Calculate metrics function
+def calculate_metrics(df):
+    return kpi_engine(_row_keys(df), df['transaction_qty'].to_numpy())
+
+# Metrics plus the headline totals (items sold, unit price sum/max/min) in one call
+def calculate_kpis(df):
+    qty = df['transaction_qty'].to_numpy()
+    extremes = _group_totals(_row_keys(df), qty)
+    kpis = _metrics_from_extremes(extremes, np.issubdtype(qty.dtype, np.integer))
+    price = df['unit_price'].to_numpy(dtype=float)
+    kpis.update({
+        # Rows with a product, reusing the product codes instead of another scan
+        'count': int(extremes['product_detail'][2].sum()),
+        'price_sum': float(np.nansum(price)),
+        'price_max': float(np.nanmax(price)),
+        'price_min': float(np.nanmin(price)),
+    })
+    return kpis
+
+
+# Folds chunks of transactions into running totals, so metrics and the daily
+# series can be computed without holding the whole sheet in memory
+class MetricsAccumulator:
+    def __init__(self):
+        self.count = 0
+        self.price_sum = 0.0
+        self.price_max = None
+        self.price_min = None
+        self._group_totals = {column: None for column in GROUP_COLUMNS}
+        self._daily = None
+
+    # Add one chunk of typed transactions
+    def add(self, chunk):
+        if chunk.empty:
+            return self
+        self.count += int(chunk['product_detail'].count())
+        self.price_sum += float(chunk['unit_price'].sum())
+        chunk_max = float(chunk['unit_price'].max())
+        chunk_min = float(chunk['unit_price'].min())
+        self.price_max = chunk_max if self.price_max is None else max(self.price_max, chunk_max)
+        self.price_min = chunk_min if self.price_min is None else min(self.price_min, chunk_min)
+
+        for column in GROUP_COLUMNS:
+            partial = chunk.groupby(column, observed=True)['transaction_qty'].sum()
+            current = self._group_totals[column]
+            self._group_totals[column] = partial if current is None else current.add(partial, fill_value=0)
+
+        day = chunk['transaction_date'].dt.normalize().rename('ds')
+        partial = chunk.groupby(day)['unit_price'].agg(['sum', 'count'])
+        self._daily = partial if self._daily is None else self._daily.add(partial, fill_value=0)
+        return self
+
+    # Same dictionary as calculate_metrics
+    def metrics(self):
+        totals = {column: series.reset_index() for column, series in self._group_totals.items()}
+        return _metrics_from_totals(totals)
+
+    # Daily unit price sum (revenue) and mean, on a continuous daily index like pd.Grouper(freq='D')
+    def daily_series(self):
+        daily = self._daily.sort_index().asfreq('D', fill_value=0)
+        mean = (daily['sum'] / daily['count']).where(daily['count'] > 0)
+        revenue_df = pd.DataFrame({'ds': daily.index, 'y': daily['sum'].values})
+        price_df = pd.DataFrame({'ds': daily.index, 'y': mean.values})
+        return revenue_df, price_df
+
+
+# Grain of the pre-aggregated cube the sidebar filters and KPIs are answered from
+CUBE_DIMENSIONS = ['day', 'hour', 'store_location', 'product_category', 'product_type', 'product_detail']
+
+# Aggregate transactions to day x hour x store x category x type x product, once per upload
+def build_cube(df):
+    # Sums are accumulated in 64-bit even when the frame uses the compact schema
+    qty = df['transaction_qty'].astype('int64')
+    price = df['unit_price'].astype('float64')
+    source = df[['hour', 'store_location', 'product_category', 'product_type', 'product_detail']].assign(
+        transaction_qty=qty,
+        unit_price=price,
+        day=df['transaction_date'].dt.normalize(),
+        revenue=qty * price,
+    )
+    # observed=True: categorical keys must not expand to every combination of categories
+    cube = source.groupby(CUBE_DIMENSIONS, sort=False, observed=True).agg(
+        transaction_qty=('transaction_qty', 'sum'),
+        unit_price=('unit_price', 'sum'),
+        revenue=('revenue', 'sum'),
+        price_max=('unit_price', 'max'),
+        price_min=('unit_price', 'min'),
+        count=('product_detail', 'count'),
+    ).reset_index()
+    cube['day_of_week'] = cube['day'].dt.day_name()
+    return cube
+
+# Size-bounded LRU of cubes, keyed by the content key of the dataset they were built from
+class CubeCache:
+    def __init__(self, max_bytes=128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        return None
+
+    def put(self, key, cube):
+        size = int(cube.memory_usage(deep=True).sum())
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = cube
+            self._sizes[key] = size
+            # Evict least recently used entries, but always keep the newest one
+            while sum(self._sizes.values()) > self.max_bytes and len(self._entries) > 1:
+                old_key, _ = self._entries.popitem(last=False)
+                del self._sizes[old_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+
+
+# Cubes are small, so a modest budget holds one per recent upload
+cube_cache = CubeCache()
+
+# Cube for an upload, built on the first rerun that sees it
+def get_cube(key, df):
+    cube = cube_cache.get(key)
+    if cube is None:
+        cube = build_cube(df)
+        cube_cache.put(key, cube)
+    return cube
+
+# Cube cells inside the date range
+def filter_cube_dates(cube, start_date, end_date):
+    return cube[(cube['day'] >= pd.Timestamp(start_date)) & (cube['day'] <= pd.Timestamp(end_date))]
+
+
+# Running totals over the cube for the current date range and sidebar selection.
+# A change is applied one filter dimension at a time: only the cube cells of the days,
+# stores, categories or types that were switched on or off are added or subtracted,
+# so moving the end date by a day touches one day of cells instead of the whole cube.
+class IncrementalAggregator:
+    FILTERS = ['day', 'store_location', 'product_category', 'product_type']
+    GROUPS = ['product_detail', 'product_type', 'product_category', 'store_location', 'hour', 'day_of_week', 'day']
+    MEASURES = ['qty', 'count', 'price']
+
+    def __init__(self, cube):
+        self.codes = {}
+        self.labels = {}
+        days = cube['day'].to_numpy(dtype='datetime64[D]')
+        self.first_day = days.min() if len(days) else np.datetime64('1970-01-01')
+        self.codes['day'] = (days - self.first_day).astype(np.intp)
+        self.labels['day'] = self.first_day + np.arange(self.codes['day'].max() + 1 if len(days) else 0)
+        for column in ['product_detail', 'product_type', 'product_category', 'store_location']:
+            key = _label_key(cube[column])
+            codes, labels = key if isinstance(key, tuple) else pd.factorize(key)
+            self.codes[column] = np.asarray(codes, dtype=np.intp)
+            self.labels[column] = np.asarray(labels)
+        self.codes['hour'], self.labels['hour'] = cube['hour'].to_numpy().astype(np.intp), np.arange(24)
+        self.codes['day_of_week'], self.labels['day_of_week'] = weekday_codes(cube['day'])
+
+        self.measures = {
+            'qty': cube['transaction_qty'].to_numpy(dtype=float),
+            'count': cube['count'].to_numpy(dtype=float),
+            'price': cube['unit_price'].to_numpy(dtype=float),
+        }
+        # Max and min cannot be subtracted, so keep how many selected cells hold each value
+        self.max_codes, self.max_values = pd.factorize(cube['price_max'].to_numpy(dtype=float))
+        self.min_codes, self.min_values = pd.factorize(cube['price_min'].to_numpy(dtype=float))
+        self.max_hist = np.zeros(len(self.max_values))
+        self.min_hist = np.zeros(len(self.min_values))
+
+        # Cells of every filter value, as slices of a sorted index
+        self._index = {}
+        for dim in self.FILTERS:
+            order = np.argsort(self.codes[dim], kind='stable')
+            bounds = np.searchsorted(self.codes[dim][order], np.arange(len(self.labels[dim]) + 1))
+            self._index[dim] = (order, bounds)
+
+        self.selected = {dim: np.zeros(len(self.labels[dim]), dtype=bool) for dim in self.FILTERS}
+        self.totals = {group: {measure: np.zeros(len(self.labels[group])) for measure in self.MEASURES}
+                       for group in self.GROUPS}
+        self.cells_touched = 0
+
+    # Add (sign +1) or subtract (sign -1) cube cells from every running total
+    def _apply(self, cells, sign):
+        for group in self.GROUPS:
+            codes = self.codes[group][cells]
+            size = len(self.labels[group])
+            for measure in self.MEASURES:
+                self.totals[group][measure] += np.bincount(codes, weights=sign * self.measures[measure][cells], minlength=size)
+        self.max_hist += np.bincount(self.max_codes[cells], weights=sign, minlength=len(self.max_values))
+        self.min_hist += np.bincount(self.min_codes[cells], weights=sign, minlength=len(self.min_values))
+        self.cells_touched += len(cells)
+
+    # Move to a new date range and selection, touching only the cells that changed
+    def update(self, start_date, end_date, stores, categories, types):
+        start = (np.datetime64(pd.Timestamp(start_date).date()) - self.first_day).astype(np.int64)
+        end = (np.datetime64(pd.Timestamp(end_date).date()) - self.first_day).astype(np.int64)
+        day_numbers = np.arange(len(self.labels['day']))
+        targets = {
+            'day': (day_numbers >= start) & (day_numbers <= end),
+            'store_location': np.isin(self.labels['store_location'], list(stores)),
+            'product_category': np.isin(self.labels['product_category'], list(categories)),
+            'product_type': np.isin(self.labels['product_type'], list(types)),
+        }
+        self.cells_touched = 0
+        for dim in self.FILTERS:
+            new = targets[dim]
+            toggled = np.flatnonzero(new != self.selected[dim])
+            if not toggled.size:
+                continue
+            order, bounds = self._index[dim]
+            cells = np.concatenate([order[bounds[value]:bounds[value + 1]] for value in toggled])
+            self.selected[dim] = new
+            # Only cells that the other dimensions currently select contribute
+            keep = np.ones(len(cells), dtype=bool)
+            for other in self.FILTERS:
+                if other != dim:
+                    keep &= self.selected[other][self.codes[other][cells]]
+            cells = cells[keep]
+            if cells.size:
+                self._apply(cells, np.where(new, 1.0, -1.0)[self.codes[dim][cells]])
+        return self
+
+    @property
+    def empty(self):
+        return self.totals['day']['count'].sum() < 0.5
+
+    # Same dictionary as calculate_metrics for the current selection
+    def metrics(self):
+        def pick(column, func):
+            totals = self.totals[column]
+            # Quantities are whole numbers; rounding drops float noise from add/subtract cycles
+            return _pick(column, self.labels[column], np.rint(totals['qty']), totals['count'] > 0.5, func, True)
+
+        return {
+            'most_sold_product': pick('product_detail', np.argmax),
+            'least_sold_product': pick('product_detail', np.argmin),
+            'most_sold_type': pick('product_type', np.argmax),
+            'most_sold_category': pick('product_category', np.argmax),
+            'busiest_hour': pick('hour', np.argmax),
+            'busiest_day': pick('day_of_week', np.argmax),
+            'most_idle_day': pick('day_of_week', np.argmin)
+        }
+
+    # Headline KPIs (items sold and unit price sum/max/min), as in calculate_kpis, for the current selection
+    def kpis(self):
+        return {
+            'count': int(round(self.totals['day']['count'].sum())),
+            'price_sum': float(self.totals['day']['price'].sum()),
+            'price_max': float(self.max_values[self.max_hist > 0.5].max()),
+            'price_min': float(self.min_values[self.min_hist > 0.5].min()),
+        }
+
+    # Per-group totals of one measure ('qty', 'count' or 'price') for the groups present in the selection
+    def distribution(self, column, measure, name=None):
+        totals = self.totals[column]
+        present = totals['count'] > 0.5
+        return pd.DataFrame({column: self.labels[column][present], name or measure: totals[measure][present]})
+
+    # Daily unit price sum (revenue) and mean over the selected days, matching
+    # groupby(pd.Grouper(key='transaction_date', freq='D')) on the selected rows
+    def daily_series(self):
+        totals = self.totals['day']
+        days = np.flatnonzero(totals['count'] > 0.5)
+        span = slice(days[0], days[-1] + 1) if days.size else slice(0, 0)
+        ds = pd.to_datetime(self.labels['day'][span])
+        counts = totals['count'][span]
+        revenue = totals['price'][span]
+        mean = np.divide(revenue, counts, out=np.full(len(counts), np.nan), where=counts > 0.5)
+        return pd.DataFrame({'ds': ds, 'y': revenue}), pd.DataFrame({'ds': ds, 'y': mean})
@@ -0,0 +1,141 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# One JSON line per rerun with the timings of every stage. Written to BSA_PERF_LOG, or to
+# logs/perf.jsonl while the Performance panel is open.
+PERF_LOG_PATH = os.environ.get("BSA_PERF_LOG", os.path.join(ROOT, 'logs', 'perf.jsonl'))
+PERF_LOG_ALWAYS = "BSA_PERF_LOG" in os.environ
+perf_log = logging.getLogger('bsa.perf')
+perf_log.setLevel(logging.INFO)
+perf_log.propagate = False
+
+# cProfile dumps of single reruns
+PROFILE_DIR = os.environ.get("BSA_PROFILE_DIR", os.path.join(ROOT, 'profiles'))
+
+
+def _log_handler():
+    if not perf_log.handlers:
+        os.makedirs(os.path.dirname(PERF_LOG_PATH), exist_ok=True)
+        handler = logging.FileHandler(PERF_LOG_PATH)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        perf_log.addHandler(handler)
+    return perf_log
+
+
+# tracemalloc is process-wide, so at most one timer traces at a time: peaks reset or
+# stopped by one session would otherwise corrupt another's, and the tracer must be
+# stopped by whoever started it
+_tracer_lock = threading.Lock()
+_tracer_owner = None
+
+
+# Wall time, CPU time and (optionally) peak Python allocations of consecutive pipeline
+# stages. checkpoint(name) ends the running stage and starts the next one, so a script can
+# be split into stages without re-indenting it. Peak allocations come from tracemalloc,
+# which slows Python code down noticeably, so it is only on when asked for, and only for
+# the timer that owns the tracer; memory_busy says another timer had it.
+class StageTimer:
+    def __init__(self, trace_memory=False):
+        global _tracer_owner
+        self.trace_memory = False
+        self.memory_busy = False
+        self.records = []
+        self._current = None
+        if trace_memory:
+            with _tracer_lock:
+                if _tracer_owner is None and not tracemalloc.is_tracing():
+                    _tracer_owner = self
+                    tracemalloc.start()
+                    self.trace_memory = True
+                else:
+                    self.memory_busy = True
+
+    def _close(self):
+        if self._current is None:
+            return
+        name, wall, cpu, memory = self._current
+        record = {
+            'stage': name,
+            'wall_ms': (time.perf_counter() - wall) * 1000,
+            'cpu_ms': (time.process_time() - cpu) * 1000,
+        }
+        if self.trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            record['peak_kb'] = max(peak - memory, 0) / 1024
+        self.records.append(record)
+        self._current = None
+
+    def checkpoint(self, name):
+        self._close()
+        memory = 0
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            memory = tracemalloc.get_traced_memory()[0]
+        self._current = (name, time.perf_counter(), time.process_time(), memory)
+
+    # End the last stage and give up the tracer if this timer owns it. Call it from a
+    # finally block: a rerun stopped midway must not leave tracemalloc running.
+    def finish(self):
+        global _tracer_owner
+        self._close()
+        if self.trace_memory:
+            with _tracer_lock:
+                if _tracer_owner is self:
+                    tracemalloc.stop()
+                    _tracer_owner = None
+        return self.records
+
+    def frame(self):
+        return pd.DataFrame(self.records, columns=['stage', 'wall_ms', 'cpu_ms'] + (['peak_kb'] if self.trace_memory else []))
+
+    def log(self, **context):
+        total = sum(record['wall_ms'] for record in self.records)
+        _log_handler().info(json.dumps({'time': time.strftime('%Y-%m-%dT%H:%M:%S'), **context,
+                                        'total_ms': total, 'stages': self.records}))
+
+
+# Run func under cProfile. Returns its result, the path of the saved .prof file and a
+# text summary of the functions with the highest cumulative time.
+def profile_call(func, *args, top=25, **kwargs):
+    profiler = cProfile.Profile()
+    try:
+        result = profiler.runcall(func, *args, **kwargs)
+    finally:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"rerun-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+        profiler.dump_stats(path)
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(top)
+    return result, path, summary.getvalue()
+
+
+# Sidebar panel with the stage timings of this rerun and the last cProfile dump, if any
+def performance_panel(timer, profile=None):
+    import streamlit as st
+
+    with st.sidebar.expander("Performance", expanded=True):
+        table = timer.frame()
+        st.dataframe(table.round(1), use_container_width=True)
+        st.caption(f"Rerun total: {table['wall_ms'].sum():,.0f} ms wall, {table['cpu_ms'].sum():,.0f} ms CPU")
+        if timer.memory_busy:
+            st.caption("Peak memory is being traced for another session; it is not shown for this rerun.")
+        if st.button("Profile next rerun"):
+            # Rerun straight away, this time under cProfile
+            st.session_state['profile_next_rerun'] = True
+            st.experimental_rerun()
+        if profile:
+            path, summary = profile
+            st.text(summary)
+            with open(path, 'rb') as f:
+                st.download_button("Download profile (.prof)", data=f.read(), file_name=os.path.basename(path))
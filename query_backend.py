@@ -0,0 +1,295 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from metrics import DAY_NAMES, _metrics_from_extremes, calculate_kpis
+from shared_frames import shared_frames
+
+# Query engines the dashboards can answer their row-level aggregations with. DuckDB runs
+# them as multi-threaded SQL over a zero-copy view of the frame; pandas is the fallback
+# when duckdb is not installed.
+QUERY_BACKENDS = {
+    'duckdb': "DuckDB (multi-threaded SQL)",
+    'pandas': "pandas",
+}
+
+# Columns the KPI cards are computed over, in the order of calculate_metrics
+KPI_COLUMNS = ['product_detail', 'product_type', 'product_category', 'hour', 'day_of_week']
+
+
+def default_backend():
+    name = os.environ.get("BSA_QUERY_BACKEND")
+    if name:
+        return name
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return 'pandas'
+    return 'duckdb'
+
+
+# Sidebar selection shared by every backend; None leaves a column unfiltered
+def make_selection(start_date, end_date, stores=None, categories=None, types=None):
+    return {
+        'start': pd.Timestamp(start_date),
+        'end': pd.Timestamp(end_date),
+        'store_location': None if stores is None else list(stores),
+        'product_category': None if categories is None else list(categories),
+        'product_type': None if types is None else list(types),
+    }
+
+FILTER_COLUMNS = ['store_location', 'product_category', 'product_type']
+
+
+# Per-day totals on a continuous daily index, like groupby(pd.Grouper(freq='D')): sums are 0
+# and the mean price is NaN on days without transactions
+def _continuous_days(daily):
+    if daily.empty:
+        return daily
+    daily = daily.sort_index().asfreq('D')
+    sums = ['revenue', 'price_sum', 'transaction_qty', 'count']
+    daily[sums] = daily[sums].fillna(0)
+    return daily
+
+
+# Positions that sort `values`, missing values last and ties in row order. Unordered
+# categoricals sort by label rather than by category code.
+def _sort_order(values, ascending=True):
+    values = values.reset_index(drop=True)
+    if isinstance(values.dtype, pd.CategoricalDtype) and not values.cat.ordered:
+        ranks = values.cat.categories.argsort().argsort().astype(float)
+        codes = values.cat.codes.to_numpy()
+        values = pd.Series(np.where(codes >= 0, ranks[codes], np.nan))
+    return values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+
+
+class PandasBackend:
+    name = 'pandas'
+
+    def __init__(self, df):
+        self.df = df
+
+    def _mask(self, selection):
+        df = self.df
+        mask = (df['transaction_date'] >= selection['start']) & (df['transaction_date'] <= selection['end'])
+        for column in FILTER_COLUMNS:
+            if selection[column] is not None:
+                mask &= df[column].isin(selection[column])
+        return mask
+
+    # Transactions in the selection
+    def select(self, selection, columns=None):
+        rows = self.df[self._mask(selection)]
+        return rows[list(columns)] if columns else rows
+
+    @property
+    def columns(self):
+        return list(self.df.columns)
+
+    # Number of transactions in the selection
+    def count(self, selection):
+        return int(self._mask(selection).sum())
+
+    # One window of the selection, optionally sorted by a column. Only the mask and the
+    # sort column are scanned; just the window's rows are materialized.
+    def page(self, selection, offset, limit, sort_by=None, ascending=True, columns=None):
+        positions = np.flatnonzero(self._mask(selection).to_numpy())
+        if sort_by is not None:
+            positions = positions[_sort_order(self.df[sort_by].iloc[positions], ascending)]
+        return self.df.iloc[positions[offset:offset + limit]][list(columns) if columns else self.columns]
+
+    # Distinct values of a column in the selection, sorted
+    def values(self, column, selection):
+        return sorted(self.select(selection, [column])[column].dropna().unique().tolist())
+
+    # Same dictionary as calculate_kpis
+    def kpis(self, selection):
+        return calculate_kpis(self.select(selection))
+
+    # Sum of `measure` per value of `column`, for the groups present in the selection
+    def totals_by(self, column, selection, measure='transaction_qty'):
+        rows = self.select(selection, [column, 'transaction_qty', 'unit_price'])
+        values = rows['transaction_qty'] * rows['unit_price'] if measure == 'revenue' else rows[measure]
+        totals = values.groupby(rows[column], observed=True).sum()
+        return totals.rename(measure).reset_index()
+
+    # Daily revenue (quantity x price), unit price sum and mean, quantity and transaction count
+    def daily(self, selection):
+        rows = self.select(selection, ['transaction_date', 'transaction_qty', 'unit_price'])
+        rows = rows.assign(revenue=rows['transaction_qty'] * rows['unit_price'].astype(float))
+        daily = rows.groupby(rows['transaction_date'].dt.normalize().rename('ds')).agg(
+            revenue=('revenue', 'sum'),
+            price_sum=('unit_price', 'sum'),
+            price_mean=('unit_price', 'mean'),
+            transaction_qty=('transaction_qty', 'sum'),
+            count=('unit_price', 'size'),
+        )
+        return _continuous_days(daily)
+
+
+class DuckDBBackend:
+    name = 'duckdb'
+
+    def __init__(self, df):
+        import duckdb
+
+        self.df = df
+        self._con = duckdb.connect()
+        # A view over the frame's own buffers, nothing is copied into DuckDB
+        self._con.register('transactions', df)
+        self._lock = threading.Lock()
+        # Frames from data_loader carry hour and weekday codes; others derive them in SQL
+        self.hour_sql = 'hour' if 'hour' in df else 'hour(transaction_date)'
+        self.weekday_sql = 'weekday' if 'weekday' in df else '(isodow(transaction_date) - 1)'
+
+    # WHERE clause and parameters of a selection; filters are pushed into the scan
+    def _where(self, selection):
+        clauses = ['transaction_date >= ?', 'transaction_date <= ?']
+        params = [selection['start'].to_pydatetime(), selection['end'].to_pydatetime()]
+        for column in FILTER_COLUMNS:
+            if selection[column] is None:
+                continue
+            values = [str(value) for value in selection[column]]
+            if not values:
+                return 'FALSE', []
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        return ' AND '.join(clauses), params
+
+    def _query(self, sql, params):
+        with self._lock:
+            return self._con.execute(sql, params).fetchdf()
+
+    def select(self, selection, columns=None):
+        where, params = self._where(selection)
+        projection = ', '.join(f'"{column}"' for column in columns) if columns else '*'
+        return self._query(f"SELECT {projection} FROM transactions WHERE {where} ORDER BY transaction_date", params)
+
+    @property
+    def columns(self):
+        return list(self.df.columns)
+
+    def count(self, selection):
+        where, params = self._where(selection)
+        return int(self._query(f"SELECT COUNT(*) AS rows FROM transactions WHERE {where}", params)['rows'].iloc[0])
+
+    # The window comes straight from the scan with LIMIT/OFFSET
+    def page(self, selection, offset, limit, sort_by=None, ascending=True, columns=None):
+        where, params = self._where(selection)
+        projection = ', '.join(f'"{column}"' for column in columns) if columns else '*'
+        order = f'"{sort_by}" {"ASC" if ascending else "DESC"} NULLS LAST, transaction_date' if sort_by else 'transaction_date'
+        return self._query(f"SELECT {projection} FROM transactions WHERE {where} ORDER BY {order} "
+                           f"LIMIT {int(limit)} OFFSET {int(offset)}", params)
+
+    def values(self, column, selection):
+        where, params = self._where(selection)
+        result = self._query(f"SELECT {column} FROM transactions WHERE {where} AND {column} IS NOT NULL "
+                             f"GROUP BY {column} ORDER BY {column}", params)
+        return result[column].astype(object).tolist()
+
+    # Same dictionary as calculate_kpis: the per-column totals and the headline figures come
+    # from one scan with grouping sets, and the best/worst groups are picked like the pandas engine
+    def kpis(self, selection):
+        where, params = self._where(selection)
+        result = self._query(f"""
+            SELECT product_detail, product_type, product_category,
+                   {self.hour_sql} AS hour, {self.weekday_sql} AS weekday,
+                   GROUPING(product_detail, product_type, product_category, {self.hour_sql}, {self.weekday_sql}) AS grouping_id,
+                   SUM(transaction_qty) AS transaction_qty, COUNT(*) AS rows,
+                   COUNT(product_detail) AS count, SUM(unit_price) AS price_sum,
+                   MAX(unit_price) AS price_max, MIN(unit_price) AS price_min
+            FROM transactions WHERE {where}
+            GROUP BY GROUPING SETS ((product_detail), (product_type), (product_category),
+                                    ({self.hour_sql}), ({self.weekday_sql}), ())
+        """, params)
+
+        extremes = {}
+        # GROUPING() sets a bit for every column that is not grouped on, first column highest
+        for bit, column in zip(range(4, -1, -1), KPI_COLUMNS):
+            part = result[result['grouping_id'] == 31 - (1 << bit)]
+            key = part['weekday' if column == 'day_of_week' else column]
+            part = part[key.notna()]
+            key = key[key.notna()]
+            if column == 'day_of_week':
+                labels = DAY_NAMES[key.to_numpy(dtype=int)]
+            elif column == 'hour':
+                labels = key.to_numpy(dtype=int)
+            else:
+                labels = key.astype(object).to_numpy()
+            extremes[column] = (labels, part['transaction_qty'].to_numpy(dtype=float), part['rows'].to_numpy())
+        kpis = _metrics_from_extremes(extremes, as_int=True)
+
+        headline = result[result['grouping_id'] == 31].iloc[0]
+        kpis.update({
+            'count': int(headline['count']),
+            'price_sum': float(headline['price_sum']) if pd.notna(headline['price_sum']) else 0.0,
+            'price_max': float(headline['price_max']),
+            'price_min': float(headline['price_min']),
+        })
+        return kpis
+
+    def totals_by(self, column, selection, measure='transaction_qty'):
+        where, params = self._where(selection)
+        value = 'transaction_qty * unit_price' if measure == 'revenue' else measure
+        result = self._query(f"SELECT {column}, SUM({value}) AS {measure} FROM transactions WHERE {where} "
+                             f"GROUP BY {column} ORDER BY {column}", params)
+        result[column] = result[column].astype(object)
+        return result
+
+    def daily(self, selection):
+        where, params = self._where(selection)
+        daily = self._query(f"""
+            SELECT date_trunc('day', transaction_date) AS ds,
+                   SUM(transaction_qty * CAST(unit_price AS DOUBLE)) AS revenue,
+                   SUM(unit_price) AS price_sum, AVG(unit_price) AS price_mean,
+                   SUM(transaction_qty) AS transaction_qty, COUNT(*) AS count
+            FROM transactions WHERE {where} GROUP BY ds
+        """, params)
+        daily['ds'] = pd.to_datetime(daily['ds'])
+        return _continuous_days(daily.set_index('ds').astype(float))
+
+    def close(self):
+        with self._lock:
+            self._con.close()
+
+
+ENGINES = {'duckdb': DuckDBBackend, 'pandas': PandasBackend}
+
+# Engines for the most recent datasets, so a DuckDB view is registered once per upload
+_engines = OrderedDict()
+_engines_lock = threading.Lock()
+MAX_ENGINES = 4
+
+
+# An engine references its frame (and DuckDB's view of it), so engines go as soon as the
+# shared registry unmaps their dataset; otherwise they would keep evicted frames alive
+def _drop_unmapped():
+    for entry in [entry for entry in _engines if not shared_frames.mapped(entry[1])]:
+        evicted = _engines.pop(entry)
+        if hasattr(evicted, 'close'):
+            evicted.close()
+
+
+# Query engine for a dataset, keyed by its content key. Falls back to pandas when the
+# requested backend cannot be loaded.
+def query_engine(key, df, backend=None):
+    backend = backend or default_backend()
+    with _engines_lock:
+        _drop_unmapped()
+        if (backend, key) in _engines:
+            _engines.move_to_end((backend, key))
+            return _engines[(backend, key)]
+    try:
+        engine = ENGINES[backend](df)
+    except ImportError:
+        engine = PandasBackend(df)
+    with _engines_lock:
+        _engines[(backend, key)] = engine
+        while len(_engines) > MAX_ENGINES:
+            _, evicted = _engines.popitem(last=False)
+            if hasattr(evicted, 'close'):
+                evicted.close()
+    return engine
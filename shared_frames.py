@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+import time
+
+# Parsed frames are written here once, as Arrow IPC files, and memory-mapped by every
+# session and worker process on the host. Set BSA_SHARED_DIR to put them elsewhere
+# (e.g. on /dev/shm).
+SHARED_DIR = os.environ.get("BSA_SHARED_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared'))
+
+# A frame nobody has used for this long is unmapped and its file removed
+IDLE_SECONDS = float(os.environ.get("BSA_SHARED_IDLE_MINUTES", "30")) * 60
+
+# Layout of the published frames. It is part of every file name, so files written by
+# older code are never mapped after a deploy (they are deleted once idle). Bump it
+# whenever the output of data_loader.parse_upload, finish_frame or compact_schema changes.
+FRAME_VERSION = 2
+
+
+# Process-wide registry of parsed frames backed by memory-mapped Arrow IPC files. The
+# numeric, datetime and categorical columns of a mapped frame point straight into the
+# page cache, so every session and process that opens the same upload shares one copy
+# of them. Mapped columns are read-only.
+#
+# Sessions hold a lease on the frames they use (acquire); a lease not renewed within
+# idle_seconds expires, since Streamlit does not say when a session goes away. A frame
+# without leases is dropped once it has been idle that long, and its file is deleted
+# when no process has touched it for that long either.
+class SharedFrameRegistry:
+    def __init__(self, root=SHARED_DIR, idle_seconds=IDLE_SECONDS, version=FRAME_VERSION):
+        self.root = root
+        self.idle_seconds = idle_seconds
+        self.suffix = f".v{version}.arrow"
+        self.hits = 0
+        self.misses = 0
+        self._frames = {}
+        self._last_used = {}
+        self._leases = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.root, key + self.suffix)
+
+    def contains(self, key):
+        return key in self._frames or os.path.exists(self._path(key))
+
+    # Whether this process currently has the frame mapped
+    def mapped(self, key):
+        with self._lock:
+            return key in self._frames
+
+    # Write a frame under its content key, unless some process already has. The file is
+    # renamed into place, so readers never see a partial one.
+    def publish(self, key, df):
+        import pyarrow as pa
+
+        path = self._path(key)
+        if os.path.exists(path):
+            return path
+        os.makedirs(self.root, exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # df.attrs (e.g. the sizes memory_report compares against) travel in the schema
+        table = table.replace_schema_metadata({**table.schema.metadata, b'bsa_attrs': json.dumps(df.attrs).encode()})
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+        return path
+
+    def _map(self, key):
+        import pyarrow as pa
+
+        source = pa.memory_map(self._path(key))
+        table = pa.ipc.open_file(source).read_all()
+        df = table.to_pandas(split_blocks=True)
+        df.attrs.update(json.loads((table.schema.metadata or {}).get(b'bsa_attrs', b'{}')))
+        return df
+
+    # The mapped frame for a key, or None when it has not been published. Works in any
+    # process, so workers can be handed a key instead of a pickled frame.
+    def open(self, key):
+        with self._lock:
+            df = self._frames.get(key)
+        if df is None:
+            if not os.path.exists(self._path(key)):
+                with self._lock:
+                    self.misses += 1
+                return None
+            try:
+                df = self._map(key)
+            except FileNotFoundError:
+                # Evicted by another process in the meantime
+                with self._lock:
+                    self.misses += 1
+                return None
+            with self._lock:
+                df = self._frames.setdefault(key, df)
+        else:
+            with self._lock:
+                self.hits += 1
+        now = time.time()
+        with self._lock:
+            self._last_used[key] = now
+        try:
+            os.utime(self._path(key), (now, now))
+        except FileNotFoundError:
+            pass
+        return df
+
+    # Open a frame on behalf of a holder (a session) and take or renew its lease
+    def acquire(self, key, holder=None):
+        self.evict_idle()
+        df = self.open(key)
+        if df is not None and holder is not None:
+            with self._lock:
+                self._leases.setdefault(key, {})[holder] = time.time()
+        return df
+
+    # Give up a holder's lease on one frame, or on all of them
+    def release(self, holder, key=None):
+        with self._lock:
+            for leased in [key] if key is not None else list(self._leases):
+                self._leases.get(leased, {}).pop(holder, None)
+                if not self._leases.get(leased):
+                    self._leases.pop(leased, None)
+
+    def refcount(self, key):
+        with self._lock:
+            return len(self._leases.get(key, {}))
+
+    # Expire stale leases, unmap frames that are unleased and idle, and delete files no
+    # process has used within idle_seconds. Returns the keys that were unmapped.
+    def evict_idle(self, now=None):
+        now = time.time() if now is None else now
+        cutoff = now - self.idle_seconds
+        evicted = []
+        with self._lock:
+            for key in list(self._leases):
+                self._leases[key] = {holder: seen for holder, seen in self._leases[key].items() if seen >= cutoff}
+                if not self._leases[key]:
+                    del self._leases[key]
+            for key in list(self._frames):
+                if key not in self._leases and self._last_used.get(key, 0) < cutoff:
+                    del self._frames[key]
+                    self._last_used.pop(key, None)
+                    evicted.append(key)
+            leased = set(self._leases)
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                if not name.endswith('.arrow'):
+                    continue
+                # Files of another frame version are never leased, so they go once idle
+                if name.endswith(self.suffix) and name[:-len(self.suffix)] in leased:
+                    continue
+                try:
+                    if os.path.getmtime(os.path.join(self.root, name)) < cutoff:
+                        # Processes that still map the file keep their pages until they let go
+                        os.remove(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    pass
+        return evicted
+
+    # Drop the mapped frames of this process, and with files=True the files themselves
+    def clear(self, files=False):
+        with self._lock:
+            self._frames.clear()
+            self._last_used.clear()
+            self._leases.clear()
+        if files and os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                if name.endswith('.arrow'):
+                    os.remove(os.path.join(self.root, name))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'mapped': len(self._frames),
+                'leases': sum(len(holders) for holders in self._leases.values()),
+            }
+
+
+# Shared by every session in the Streamlit process
+shared_frames = SharedFrameRegistry()
@@ -0,0 +1,70 @@
+import io
+
+# Rows sent to the browser per page of the transactions table
+PAGE_SIZES = [25, 50, 100, 500]
+
+# Rows serialized at a time by the exports
+EXPORT_CHUNK_ROWS = 100000
+
+# Number of pages needed to show `rows` rows
+def page_count(rows, page_size):
+    return max(1, -(-rows // page_size))
+
+# CSV export written a chunk of rows at a time, so no single string of the whole table is built
+def export_csv(df, columns=None):
+    df = df[list(columns)] if columns else df
+    buffer = io.BytesIO()
+    for start in range(0, max(len(df), 1), EXPORT_CHUNK_ROWS):
+        chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+        buffer.write(chunk.to_csv(index=False, header=start == 0).encode())
+    return buffer.getvalue()
+
+# Parquet export written one row group per chunk
+def export_parquet(df, columns=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = df[list(columns)] if columns else df
+    df = df.assign(**{column: df[column].astype(str) for column in df.columns if df[column].dtype == object})
+    # Text columns are inferred as null from an empty frame, so the schema comes from the first chunk
+    schema = pa.Table.from_pandas(df.iloc[:EXPORT_CHUNK_ROWS], preserve_index=False).schema
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, schema) as writer:
+        for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+            chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    return buffer.getvalue()
+
+EXPORTERS = {
+    'CSV': (export_csv, 'csv', 'text/csv'),
+    'Parquet': (export_parquet, 'parquet', 'application/octet-stream'),
+}
+
+# Paginated transactions table with sort, column picker and export over a query engine's
+# selection. Only the rows of the page on screen are fetched on a rerun; the full
+# selection is read when an export is asked for. `key` keeps the widget state of
+# several tables on one page apart.
+def transactions_viewer(engine, selection, key='transactions'):
+    import streamlit as st
+
+    columns = st.multiselect("Columns", options=engine.columns, default=engine.columns, key=f"{key}_columns")
+    col1, col2, col3, col4 = st.columns(4)
+    sort_by = col1.selectbox("Sort by", options=['(none)'] + list(columns), key=f"{key}_sort")
+    ascending = col2.selectbox("Order", options=["Ascending", "Descending"], key=f"{key}_order") == "Ascending"
+    page_size = col3.selectbox("Rows per page", options=PAGE_SIZES, key=f"{key}_page_size")
+    rows = engine.count(selection)
+    pages = page_count(rows, page_size)
+    page = col4.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+
+    offset = (min(int(page), pages) - 1) * page_size
+    window = engine.page(selection, offset, page_size, None if sort_by == '(none)' else sort_by, ascending, columns)
+    st.dataframe(window, use_container_width=True)
+    st.caption(f"Showing {len(window):,} of {rows:,} transactions")
+
+    # Exports are only built on request, not on every rerun
+    col5, col6 = st.columns(2)
+    export_format = col5.selectbox("Export format", options=list(EXPORTERS), key=f"{key}_export_format")
+    if col6.button("Prepare export", key=f"{key}_export"):
+        exporter, extension, mime = EXPORTERS[export_format]
+        st.download_button(f"Download {export_format}", data=exporter(engine.select(selection, columns), columns),
+                           file_name=f"transactions.{extension}", mime=mime, key=f"{key}_download")
@@ -0,0 +1,33 @@
+"""Smoke test: the Home page renders a small dataset end to end."""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+
+def test_home_renders_dataset(tmp_path, monkeypatch):
+    from synthetic import generate_transactions, write_transactions
+    from dataset_store import dataset_store
+    from shared_frames import shared_frames
+
+    # The app's stores write under tmp_path instead of the repository
+    monkeypatch.setattr(dataset_store, 'root', str(tmp_path / 'store'))
+    monkeypatch.setattr(shared_frames, 'root', str(tmp_path / 'shared'))
+    path = str(tmp_path / 'transactions.csv')
+    write_transactions(generate_transactions(2000, months=2), path)
+    dataset_store.append_files('transactions', [path])
+
+    # Main.py loads images and the static config relative to the repository
+    monkeypatch.chdir(ROOT)
+    at = AppTest.from_file(os.path.join(ROOT, 'Main.py'), default_timeout=120)
+    at.run()
+    at.sidebar.radio[0].set_value("Dataset store").run()
+
+    assert not at.exception
+    assert "Key Performance Metrics" in [header.value for header in at.subheader]
@@ -1,13 +1,22 @@
+import uuid
 import streamlit as st
-import pandas as pd
 import altair as alt
 from datetime import date
-from prophet import Prophet  # Import Prophet for time series forecasting
+from forecasting import forecast_service, BACKENDS, DEFAULT_BACKEND  # Cached forecast fits
 from streamlit_extras.metric_cards import style_metric_cards
+from data_loader import process_file, process_upload, UPLOAD_TYPES
+from metrics import calculate_kpis
+from query_backend import QUERY_BACKENDS, default_backend, make_selection, query_engine
+from charts import payload_caption
+from table_view import transactions_viewer
+from figures import forecast_png
 
 # Page layout
 st.set_page_config(page_title="Analytics", page_icon="🌎", layout="wide")
 
+# Lease holder for the parsed frames this session maps from the shared registry
+SESSION_ID = st.session_state.setdefault('session_id', uuid.uuid4().hex)
+
 # Streamlit theme=none
 theme_plotly = None
 
@@ -59,116 +68,86 @@ def splash_screen():
     - Once uploaded, the dashboard will display analytics and insights based on the data in your file.
     """)
 # File uploader
-uploaded_file = st.sidebar.file_uploader("Upload your Excel file", type=["xlsx"])
+uploaded_file = st.sidebar.file_uploader("Upload your Excel, Parquet or CSV file", type=UPLOAD_TYPES)
 
 if uploaded_file:
-    # Load dataset
-    df = pd.read_excel(uploaded_file, sheet_name="Transactions")
-
-    # Convert transaction_date to datetime
-    df['transaction_date'] = pd.to_datetime(df['transaction_date'])
+    # Load dataset (parsed once per upload, then mapped from the shared registry)
+    key, df = process_upload(uploaded_file, holder=SESSION_ID)
 
-    # Extract hour and day of week
-    df['hour'] = df['transaction_date'].dt.hour
-    df['day_of_week'] = df['transaction_date'].dt.day_name()
+    # Aggregations below run as queries on this engine instead of eager pandas copies
+    query_backend = st.sidebar.selectbox("Query engine", list(QUERY_BACKENDS), index=list(QUERY_BACKENDS).index(default_backend()),
+                                         format_func=QUERY_BACKENDS.get)
+    engine = query_engine(key, df, query_backend)
 
     # Date filter
     start_date = st.sidebar.date_input("Start Date", min(df['transaction_date']).date())
     end_date = st.sidebar.date_input(label="End Date")
-
-    # Filter data by date
-    df2 = df[(df['transaction_date'] >= pd.Timestamp(start_date)) & (df['transaction_date'] <= pd.Timestamp(end_date))]
+    date_range = make_selection(start_date, end_date)
 
     # Sidebar filters
     st.sidebar.header("Please filter")
+    store_options = engine.values("store_location", date_range)
     city = st.sidebar.multiselect(
         "Select Store Location",
-        options=df2["store_location"].unique(),
-        default=df2["store_location"].unique(),
+        options=store_options,
+        default=store_options,
     )
+    category_options = engine.values("product_category", date_range)
     category = st.sidebar.multiselect(
         "Select Category",
-        options=df2["product_category"].unique(),
-        default=df2["product_category"].unique(),
+        options=category_options,
+        default=category_options,
     )
+    type_options = engine.values("product_type", date_range)
     product_type = st.sidebar.multiselect(
         "Select Type",
-        options=df2["product_type"].unique(),
-        default=df2["product_type"].unique(),
-    )
-
-    df_selection = df2.query(
-        "store_location == @city & product_category == @category & product_type == @product_type"
+        options=type_options,
+        default=type_options,
     )
 
-    # Calculate most and least sold products
-    product_sales = df_selection.groupby('product_detail')['transaction_qty'].sum().reset_index()
-    most_sold_product = product_sales.loc[product_sales['transaction_qty'].idxmax()]
-    least_sold_product = product_sales.loc[product_sales['transaction_qty'].idxmin()]
-
-    # Calculate most sold product type
-    type_sales = df_selection.groupby('product_type')['transaction_qty'].sum().reset_index()
-    most_sold_type = type_sales.loc[type_sales['transaction_qty'].idxmax()]
-
-    # Calculate most sold product category
-    category_sales = df_selection.groupby('product_category')['transaction_qty'].sum().reset_index()
-    most_sold_category = category_sales.loc[category_sales['transaction_qty'].idxmax()]
-
-    # Calculate the busiest hour
-    hour_sales = df_selection.groupby(df_selection['transaction_date'].dt.hour)['transaction_qty'].sum().reset_index()
-    busiest_hour = hour_sales.loc[hour_sales['transaction_qty'].idxmax()]
+    selection = make_selection(start_date, end_date, city, category, product_type)
 
-    # Calculate the busiest day of the week
-    day_sales = df_selection.groupby('day_of_week')['transaction_qty'].sum().reset_index()
-    busiest_day = day_sales.loc[day_sales['transaction_qty'].idxmax()]
+    # Most/least sold products, type, category, busiest hour/day and price totals in one query
+    metrics = engine.kpis(selection)
+    most_sold_product = metrics['most_sold_product']
+    least_sold_product = metrics['least_sold_product']
+    most_sold_type = metrics['most_sold_type']
+    most_sold_category = metrics['most_sold_category']
+    busiest_hour = metrics['busiest_hour']
+    busiest_day = metrics['busiest_day']
 
     # Calculate sales per store location
-    location_sales = df_selection.groupby('store_location')['transaction_qty'].sum().reset_index()
+    location_sales = engine.totals_by('store_location', selection)
 
     # Calculate percentage of total sales for each location
     total_sales = location_sales['transaction_qty'].sum()
     location_sales['percentage'] = (location_sales['transaction_qty'] / total_sales) * 100
 
-    # Calculate revenue
-    df_selection['revenue'] = df_selection['transaction_qty'] * df_selection['unit_price']
-
-    # Aggregate revenue by date
-    revenue_df = df_selection.groupby(pd.Grouper(key='transaction_date', freq='D')).agg({'revenue': 'sum'}).reset_index()
+    # Revenue, quantity and mean unit price per day, on a continuous daily index
+    daily = engine.daily(selection).reset_index()
 
     # Time series forecasting with Prophet
-    # Rename columns as Prophet expects 'ds' and 'y' column names
-    revenue_df = revenue_df.rename(columns={'transaction_date': 'ds', 'revenue': 'y'})
-
-    # Train Prophet model for revenue
-    revenue_model = Prophet()
-    revenue_model.fit(revenue_df)
-
-    # Make future predictions for revenue
-    revenue_future = revenue_model.make_future_dataframe(periods=30)  # Predict revenue for the next 30 days
-    revenue_forecast = revenue_model.predict(revenue_future)
-
-    # Aggregate unit price by date
-    price_df = df_selection.groupby(pd.Grouper(key='transaction_date', freq='D')).agg({'unit_price': 'mean'}).reset_index()
-
-    # Rename columns as Prophet expects 'ds' and 'y' column names
-    price_df = price_df.rename(columns={'transaction_date': 'ds', 'unit_price': 'y'})
-
-    # Train Prophet model for unit price
-    price_model = Prophet()
-    price_model.fit(price_df)
-
-    # Make future predictions for unit price
-    price_future = price_model.make_future_dataframe(periods=30)  # Predict unit price for the next 30 days
-    price_forecast = price_model.predict(price_future)
+    # Prophet expects 'ds' and 'y' column names
+    revenue_df = daily[['ds', 'revenue']].rename(columns={'revenue': 'y'})
+    price_df = daily[['ds', 'price_mean']].rename(columns={'price_mean': 'y'})
+
+    # Fit the revenue and unit price models in parallel and predict the next 30 days
+    backend = st.sidebar.selectbox("Forecast model", list(BACKENDS), index=list(BACKENDS).index(DEFAULT_BACKEND),
+                                   format_func=BACKENDS.get)
+    fit_times = {}
+    forecasts = forecast_service.forecast_many({'revenue': (revenue_df, {}), 'price': (price_df, {})}, periods=30,
+                                               backend=backend, timings=fit_times)
+    revenue_model, revenue_forecast = forecasts['revenue']
+    price_model, price_forecast = forecasts['price']
 
     # Metrics
     st.subheader('Key Performance')
 
     col1, col2, col3, col4 = st.columns(4)
-    col1.metric(label="⏱ Total Items Sold", value=df_selection.product_detail.count(), delta="Number of Items Sold")
-    col2.metric(label="⏱ Sum of Product Total Price USD:", value=f"{df_selection.unit_price.sum():,.0f}", delta=df_selection.unit_price.median())
-    col3.metric(label="⏱ Maximum Price USD:", value=f"{df_selection.unit_price.max():,.0f}", delta="High Price")
-    col4.metric(label="⏱ Minimum Price USD:", value=f"{df_selection.unit_price.min():,.0f}", delta="Low Price")
+    col1.metric(label="⏱ Total Items Sold", value=metrics['count'], delta="Number of Items Sold")
+    col2.metric(label="⏱ Sum of Product Total Price USD:", value=f"{metrics['price_sum']:,.0f}", delta=engine.select(selection, ['unit_price'])['unit_price'].median())
+    col3.metric(label="⏱ Maximum Price USD:", value=f"{metrics['price_max']:,.0f}", delta="High Price")
+    col4.metric(label="⏱ Minimum Price USD:", value=f"{metrics['price_min']:,.0f}", delta="Low Price")
     style_metric_cards(background_color="#00588E", border_left_color="#FF4B44", border_color="#1f66bd", box_shadow="#F71938")
 
     col5, col6 = st.columns(2)
@@ -189,10 +168,8 @@ if uploaded_file:
     # Bar chart
     with coll1:
         st.subheader("Product by Quantity")
-        source = pd.DataFrame({
-            "Quantity ($)": df_selection["transaction_qty"],
-            "Product": df_selection["product_category"]
-        })
+        # One row per category instead of one per transaction
+        source = engine.totals_by('product_category', selection).rename(columns={"transaction_qty": "Quantity ($)", "product_category": "Product"})
 
         bar_chart = alt.Chart(source).mark_bar().encode(
             x="sum(Quantity ($)):Q",
@@ -208,12 +185,13 @@ if uploaded_file:
             color='blue'
         )
         st.altair_chart(bar_chart, use_container_width=True, theme=theme_plotly)
+        st.caption(payload_caption(bar_chart))
 
     # Progress Bar
     def Progressbar():
         st.markdown("""<style>.stProgress > div > div > div > div { background-image: linear-gradient(to right, #99ff99 , #FFFF00)}</style>""", unsafe_allow_html=True)
         target = 30000000
-        current = df_selection["unit_price"].sum()
+        current = metrics['price_sum']
         percent = round((current / target) * 100)
         mybar = st.progress(0)
         if percent > 100:
@@ -238,34 +216,32 @@ if uploaded_file:
             height=400
         )
         st.altair_chart(pie_chart, use_container_width=True, theme=theme_plotly)
+        st.caption(payload_caption(pie_chart))
 
     # Bar chart for product order date by quantity
     with coll2: 
         st.subheader("Product Order Date by Quantity")
-        data = {
-            'Category': df_selection['transaction_date'],
-            'Value': df_selection['transaction_qty'],
-        }
-        df = pd.DataFrame(data)
+        # Summed per day on the server, one bar per date
+        df = daily[['ds', 'transaction_qty']].rename(columns={'ds': 'Category', 'transaction_qty': 'Value'})
         st.bar_chart(df.set_index('Category')['Value'], use_container_width=True, width=600, height=600)
 
     # Revenue forecast plot
     st.subheader("Revenue Forecast")
     st.write(revenue_forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']])
 
-    fig_revenue = revenue_model.plot(revenue_forecast)
-    st.write(fig_revenue)
+    st.image(forecast_png(revenue_model, revenue_forecast))
+    st.caption(f"{BACKENDS[backend]}: " + ("served from cache" if fit_times['revenue'] is None else f"fitted in {fit_times['revenue'] * 1000:,.0f} ms"))
 
     # Price forecast plot
     st.subheader("Price Forecast")
     st.write(price_forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']])
 
-    fig_price = price_model.plot(price_forecast)
-    st.write(fig_price)
+    st.image(forecast_png(price_model, price_forecast))
+    st.caption(f"{BACKENDS[backend]}: " + ("served from cache" if fit_times['price'] is None else f"fitted in {fit_times['price'] * 1000:,.0f} ms"))
 
     # Show a table of the transactions
     st.subheader("Transactions Table")
-    st.write(df_selection)
+    transactions_viewer(engine, selection)
 
 else:
     st.sidebar.warning("Please upload an Excel file to proceed.")
@@ -273,23 +249,23 @@ else:
 
 # Function to process and analyze files for the analytics page
 def process_and_analyze_file(uploaded_file1, uploaded_file2):
-    df1 = process_file(uploaded_file1)
-    df2 = process_file(uploaded_file2)
+    df1 = process_file(uploaded_file1, holder=SESSION_ID)
+    df2 = process_file(uploaded_file2, holder=SESSION_ID)
     
     if df1 is not None and df2 is not None:
         st.subheader('Key Performance Metrics for First File')
-        metrics1 = calculate_metrics(df1)
+        metrics1 = calculate_kpis(df1)
 
         col1, col2 = st.columns(2)
-        col1.metric(label="Total Items Sold", value=df1.product_detail.count(), delta="Number of Items Sold")
-        col2.metric(label="Sum of Product Total Price USD", value=f"{df1.unit_price.sum():,.0f}", delta="Total Price")
+        col1.metric(label="Total Items Sold", value=metrics1['count'], delta="Number of Items Sold")
+        col2.metric(label="Sum of Product Total Price USD", value=f"{metrics1['price_sum']:,.0f}", delta="Total Price")
 
         st.subheader('Key Performance Metrics for Second File')
-        metrics2 = calculate_metrics(df2)
+        metrics2 = calculate_kpis(df2)
 
         col3, col4 = st.columns(2)
-        col3.metric(label="Total Items Sold", value=df2.product_detail.count(), delta="Number of Items Sold")
-        col4.metric(label="Sum of Product Total Price USD", value=f"{df2.unit_price.sum():,.0f}", delta="Total Price")
+        col3.metric(label="Total Items Sold", value=metrics2['count'], delta="Number of Items Sold")
+        col4.metric(label="Sum of Product Total Price USD", value=f"{metrics2['price_sum']:,.0f}", delta="Total Price")
 
         # Print Button
         print_button()
@@ -319,8 +295,8 @@ def analytics_page():
     st.title("Analytics Page")
     st.sidebar.subheader("Upload your Excel files")
     
-    uploaded_file1 = st.sidebar.file_uploader("Choose the first file", type=["xlsx"], key="file_uploader_analytics_1")
-    uploaded_file2 = st.sidebar.file_uploader("Choose the second file", type=["xlsx"], key="file_uploader_analytics_2")
+    uploaded_file1 = st.sidebar.file_uploader("Choose the first file", type=UPLOAD_TYPES, key="file_uploader_analytics_1")
+    uploaded_file2 = st.sidebar.file_uploader("Choose the second file", type=UPLOAD_TYPES, key="file_uploader_analytics_2")
     
     if uploaded_file1 and uploaded_file2:
         process_and_analyze_file(uploaded_file1, uploaded_file2)